@@ -1,12 +1,16 @@
+import os
 from datetime import timedelta
 
-from flask import Flask, app, config
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from app.models import db
-from app.config import Config
+from app.config import config
 from app.auth import jwt
+from app import (async_reads, audit, cache, circulation, commands, engine, fastjson, hashing, metrics, replicas, revocation,
+                 stats, throttle)
+from app.scheduler import schedule
 
 
 # Import blueprints
@@ -15,29 +19,36 @@ from .routes.admin import admin_bp
 
 def create_app(config_name= "default"):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config[config_name])
         
     # extenstions initialization
+    engine.configure(app)
     db.init_app(app)
+    engine.init_app(app)
+    replicas.init_app(app)
     jwt.init_app(app)
-    Migrate(app, db)
+    fastjson.init_app(app)
+    # absolute, so `flask init-db` / `flask db` work from any directory
+    Migrate(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
+    commands.init_app(app)
+    hashing.init_app(app)
+    throttle.init_app(app)
+    revocation.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
+    async_reads.init_app(app)
+    audit.init_app(app)
     
     # Register blueprints
     app.register_blueprint(student_bp, url_prefix='/api/student')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     
-    # create database tables
-    with app.app_context():
-        db.create_all()
-        
-    # create a default admin user if not exists
-    from app.models import Admin
-    from werkzeug.security import generate_password_hash
-    with app.app_context():
-        if not Admin.query.filter_by(email='admin@example.com').first():
-            admin_user = Admin(firstname='Abdulaziz',middlename="Y", lastname='Sadi', email='admin@example.com', password_hash=generate_password_hash('101admin101'))
-            db.session.add(admin_user)
-            db.session.commit()
+    # no database I/O here: the schema and the first admin are set up once with
+    # `flask init-db` and `flask create-admin`, not on every worker start
+    schedule(app, 'reconcile-stats', app.config['STATS_RECONCILE_INTERVAL'], stats.reconcile)
+    # workers skip the sweep if another one ran it within the last half interval
+    sweep_interval = app.config['OVERDUE_SWEEP_INTERVAL']
+    schedule(app, 'sweep-overdue', sweep_interval, lambda: circulation.sweep_overdue(sweep_interval / 2))
             
     @app.route('/')
     def index():
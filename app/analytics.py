@@ -0,0 +1,192 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app, request
+from sqlalchemy import case, delete, func, insert, literal, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import stats
+from app.models import Book, BookCategory, GradeLevel, Loan, LoanDailyRollup, LoanRollup, Student, db
+
+
+# circulation analytics
+#
+# The reports read only two small rollup tables, never the loans table, so
+# they cost the same with ten thousand loans or ten million:
+#
+#   loan_rollups        all-time approved/returned counts per book, book
+#                       category and student grade level
+#   loan_daily_rollups  approved/returned counts per UTC day
+#
+# circulation.py calls record() in the same transaction as every approval and
+# return (single and batch), so the rollups commit or roll back with the loan
+# itself. `flask backfill-analytics` rebuilds them from the loan history, once
+# after deploying and whenever they need correcting; approvals and returns wait
+# while it runs (see backfill()).
+
+class ReportArgumentError(ValueError):
+    pass
+
+
+BORROWED_STATUSES = stats.ON_LOAN_STATUSES + ('returned',)
+
+
+def _upsert(table, keys, rows, counter):
+    # INSERT ... ON CONFLICT (keys) DO UPDATE SET counter = counter + excluded.counter
+    dialect_insert = postgresql.insert if db.session.connection().dialect.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(table).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=keys, set_={counter: table.c[counter] + statement.excluded[counter]}))
+
+
+def record(kind, loan_ids, when):
+    # kind is 'approved' or 'returned'; call in the transaction that made the transition
+    if not loan_ids:
+        return
+    rows = db.session.execute(
+        select(Loan.book_id, Book.category_id, Student.grade_level_id)
+        .select_from(Loan)
+        .outerjoin(Book, Book.id == Loan.book_id)
+        .outerjoin(Student, Student.id == Loan.student_id)
+        .where(Loan.id.in_(sorted(loan_ids)))
+    ).all()
+    counts = Counter()
+    for book_id, category_id, grade_level_id in rows:
+        counts['book', book_id] += 1
+        counts['category', category_id or 0] += 1
+        counts['grade_level', grade_level_id or 0] += 1
+
+    other = 'returned' if kind == 'approved' else 'approved'
+    # sorted, so concurrent transactions lock rollup rows in the same order
+    _upsert(LoanRollup.__table__, ['dimension', 'entity_id'], [
+        {'dimension': dimension, 'entity_id': entity_id, kind: count, other: 0}
+        for (dimension, entity_id), count in sorted(counts.items())
+    ], kind)
+    _upsert(LoanDailyRollup.__table__, ['day'], [{'day': when.date(), kind: len(rows), other: 0}], kind)
+
+
+def backfill():
+    # rebuild both rollup tables from the loans table in one transaction;
+    # returns the number of rows written to each
+    #
+    # Approvals and returns record() into the rollups while this runs, so the
+    # rollup tables are locked first: transitions already in flight finish
+    # (and are then counted from the loans table), new ones wait for the
+    # rebuild to commit and are added on top. On SQLite the first DELETE takes
+    # the database's single write lock, which does the same.
+    if db.session.connection().dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE loan_rollups, loan_daily_rollups IN SHARE ROW EXCLUSIVE MODE'))
+    db.session.execute(delete(LoanRollup))
+    db.session.execute(delete(LoanDailyRollup))
+
+    approved = func.count(case((Loan.status.in_(BORROWED_STATUSES), 1)))
+    returned = func.count(case((Loan.status == 'returned', 1)))
+    columns = ['dimension', 'entity_id', 'approved', 'returned']
+    for dimension, key, join in (
+        ('book', Loan.book_id, None),
+        ('category', func.coalesce(Book.category_id, 0), (Book, Book.id == Loan.book_id)),
+        ('grade_level', func.coalesce(Student.grade_level_id, 0), (Student, Student.id == Loan.student_id)),
+    ):
+        aggregate = select(literal(dimension), key, approved, returned).select_from(Loan)
+        if join is not None:
+            aggregate = aggregate.outerjoin(*join)
+        aggregate = aggregate.where(Loan.status.in_(BORROWED_STATUSES)).group_by(key)
+        db.session.execute(insert(LoanRollup).from_select(columns, aggregate))
+
+    days = {}
+    for column, date_column, condition in (
+        ('approved', Loan.approved_date, Loan.status.in_(BORROWED_STATUSES)),
+        ('returned', Loan.return_date, Loan.status == 'returned'),
+    ):
+        day = func.date(date_column)
+        for value, count in db.session.execute(
+            select(day, func.count()).where(condition, date_column.isnot(None)).group_by(day)
+        ):
+            row = days.setdefault(date.fromisoformat(str(value)), {'approved': 0, 'returned': 0})
+            row[column] = count
+    if days:
+        db.session.execute(insert(LoanDailyRollup), [{'day': day, **counts} for day, counts in days.items()])
+
+    db.session.commit()
+    return {
+        'loan_rollups': db.session.execute(select(func.count()).select_from(LoanRollup)).scalar(),
+        'loan_daily_rollups': len(days),
+    }
+
+
+# reports
+
+def top_books(limit):
+    rows = db.session.execute(
+        select(LoanRollup.entity_id, Book.title, Book.author, LoanRollup.approved, LoanRollup.returned)
+        .outerjoin(Book, Book.id == LoanRollup.entity_id)
+        .where(LoanRollup.dimension == 'book')
+        .order_by(LoanRollup.approved.desc(), LoanRollup.entity_id.desc())
+        .limit(limit)
+    ).all()
+    return [{'book_id': book_id, 'title': title, 'author': author, 'loans': loans, 'on_loan': loans - returned}
+            for book_id, title, author, loans, returned in rows]
+
+
+def _by_entity(dimension, model, id_key):
+    rows = db.session.execute(
+        select(LoanRollup.entity_id, model.name, LoanRollup.approved, LoanRollup.returned)
+        .outerjoin(model, model.id == LoanRollup.entity_id)
+        .where(LoanRollup.dimension == dimension)
+        .order_by(LoanRollup.entity_id)
+    ).all()
+    total = sum(row.approved for row in rows)
+    return [{
+        id_key: entity_id or None,
+        'name': name,
+        'loans': loans,
+        'on_loan': loans - returned,
+        'share_of_loans': round(loans / total, 4) if total else 0.0,
+    } for entity_id, name, loans, returned in rows]
+
+
+def by_grade_level():
+    return _by_entity('grade_level', GradeLevel, 'grade_level_id')
+
+
+def by_category():
+    return _by_entity('category', BookCategory, 'category_id')
+
+
+def _date_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ReportArgumentError(f'{name} must be an ISO date, e.g. 2026-01-31!')
+
+
+def daily_loans():
+    # ?from=&to= (to exclusive), default the last 30 days; days without loans are listed as zeros
+    today = datetime.now(timezone.utc).date()
+    end = _date_arg('to', today + timedelta(days=1))
+    start = _date_arg('from', None)
+    if start is None:
+        try:
+            start = end - timedelta(days=30)
+        except OverflowError:
+            # a `to` within 30 days of year 1 has no default `from`
+            raise ReportArgumentError('from is required this close to 0001-01-01!')
+    if start >= end:
+        raise ReportArgumentError('from must be before to!')
+    if (end - start).days > current_app.config['ANALYTICS_MAX_DAYS']:
+        raise ReportArgumentError(f"At most {current_app.config['ANALYTICS_MAX_DAYS']} days per report!")
+
+    rows = {row.day: row for row in db.session.execute(
+        select(LoanDailyRollup.day, LoanDailyRollup.approved, LoanDailyRollup.returned)
+        .where(LoanDailyRollup.day >= start, LoanDailyRollup.day < end)
+    )}
+    days = []
+    for offset in range((end - start).days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        days.append({'date': day.isoformat(), 'loans': row.approved if row else 0,
+                     'returns': row.returned if row else 0})
+    return days
@@ -0,0 +1,85 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app import metrics
+from app.engine import sqlite_pragma_hook
+from app.models import db
+
+
+# async execution mode for the hot read-only endpoints
+#
+# The dashboard, book list/details and loan/overdue listings run their query
+# through fetch() below. It executes on the request's session by default; with
+# ASYNC_READS on it goes through an SQLAlchemy AsyncSession on aiosqlite or
+# asyncpg instead (ASYNC_DATABASE_URL, the primary's URL by default). The
+# statements, auth, caching and response bodies are the same in both modes,
+# only the driver that runs the SELECT changes. Needs `flask[async]` plus the
+# async driver for the database.
+#
+# Under a WSGI server Flask runs async code in a short-lived event loop per
+# call and the worker still waits for it, so this does not free workers by
+# itself. Async driver connections are bound to the loop that opened them,
+# hence the NullPool: every fetch opens its own connection, which is cheap
+# with aiosqlite and costs a connect with asyncpg (put pgbouncer in front).
+# Measure with benchmarks/async_reads.py before switching it on.
+#
+# The async engine has no replica routing or read-your-writes, so it refuses
+# to start alongside READ_REPLICAS.
+
+ASYNC_DRIVERS = {
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+    'postgresql': ('postgresql+asyncpg', 'asyncpg'),
+}
+
+
+def async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'ASYNC_READS is not supported for {backend} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend][0])
+
+
+def init_app(app):
+    app.extensions['async_reads'] = None
+    if not app.config['ASYNC_READS']:
+        return
+    if app.config.get('READ_REPLICAS'):
+        raise RuntimeError('ASYNC_READS cannot be combined with READ_REPLICAS')
+    try:
+        import asgiref  # noqa: F401  (Flask's async support)
+    except ImportError:
+        raise RuntimeError("ASYNC_READS needs Flask's async support installed (pip install 'flask[async]')")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    if app.config['ASYNC_DATABASE_URL']:
+        url = async_url(app.config['ASYNC_DATABASE_URL'])
+    else:
+        # the sync engine's URL, with relative SQLite paths already resolved
+        with app.app_context():
+            url = async_url(db.engine.url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise RuntimeError('ASYNC_READS cannot share an in-memory SQLite database')
+    try:
+        engine = create_async_engine(url, poolclass=NullPool)
+    except ImportError:
+        raise RuntimeError(f'ASYNC_READS needs the {ASYNC_DRIVERS[url.get_backend_name()][1]} package installed')
+    if url.get_backend_name() == 'sqlite' and app.config.get('SQLITE_PRAGMAS'):
+        event.listen(engine.sync_engine, 'connect', sqlite_pragma_hook(app.config['SQLITE_PRAGMAS']))
+    metrics.watch_engine(app, engine.sync_engine)
+    app.extensions['async_reads'] = async_sessionmaker(engine)
+
+
+async def _fetch(sessionmaker, statement):
+    async with sessionmaker() as session:
+        return (await session.execute(statement)).all()
+
+
+def fetch(statement):
+    # all rows of a read-only select()
+    sessionmaker = current_app.extensions['async_reads']
+    if sessionmaker is None:
+        return db.session.execute(statement).all()
+    return current_app.ensure_sync(_fetch)(sessionmaker, statement)
@@ -0,0 +1,234 @@
+import atexit
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, has_request_context
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event, insert
+
+from app.models import AuditEvent, db
+
+
+# write-behind audit log
+#
+# record() notes who did what to which loan, book or membership on the current
+# session. The events are handed to the writer only when that transaction
+# commits (a rolled back change leaves no trace) and are written to the
+# append-only audit_events table by a background thread in batches of up to
+# AUDIT_BATCH_SIZE, so requests never wait for an audit INSERT.
+#
+# The queue holds at most AUDIT_QUEUE_SIZE events. When it is full, a committing
+# request waits up to AUDIT_ENQUEUE_TIMEOUT seconds in all for room
+# (backpressure), and whatever still doesn't fit is written inline as one
+# INSERT rather than dropped. Only the writer thread retries a failed batch;
+# an inline write that fails is logged at once, so a request never sleeps.
+#
+# On interpreter exit the queue is drained before the process ends (bounded by
+# AUDIT_SHUTDOWN_TIMEOUT). atexit hooks don't run when a process is killed by
+# a signal, so unless the server has its own SIGTERM handler (gunicorn
+# workers exit through sys.exit and do run them) init_app installs one that
+# exits the same way. SIGKILL, or a crash, loses whatever is still queued. A
+# batch that cannot be written after a few retries is logged in full as a
+# last resort.
+
+_STOP = object()
+WRITE_ATTEMPTS = 3
+
+
+def _actor():
+    if has_request_context():
+        try:
+            claims = get_jwt()
+        except RuntimeError:
+            claims = None
+        identity = claims.get(current_app.config['JWT_IDENTITY_CLAIM']) if claims else None
+        if identity is not None:
+            return claims.get('role'), int(identity)
+    return 'system', None
+
+
+def record(action, entity, entity_id, **details):
+    # e.g. record('loan.approve', 'loan', 42); written after the session commits
+    if current_app.extensions.get('audit') is None:
+        return
+    role, actor_id = _actor()
+    db.session.info.setdefault('audit_events', []).append({
+        'occurred_at': datetime.now(timezone.utc),
+        'actor_role': role,
+        'actor_id': actor_id,
+        'action': action,
+        'entity': entity,
+        'entity_id': entity_id,
+        'details': details or None,
+    })
+
+
+@event.listens_for(db.session, 'after_commit')
+def _submit_committed(session):
+    events = session.info.pop('audit_events', None)
+    if events:
+        current_app.extensions['audit'].submit(events)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_rolled_back(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('audit_events', None)
+
+
+class AuditWriter:
+    def __init__(self, app, queue_size, batch_size, flush_interval, enqueue_timeout, shutdown_timeout):
+        self.app = app
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.written = 0
+        self.written_inline = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _ensure_started(self):
+        # lazily, per process: a writer started before a fork doesn't exist in the child
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def submit(self, events):
+        # runs in after_commit, on the request thread
+        self._ensure_started()
+        deadline = None
+        for index, item in enumerate(events):
+            try:
+                self._queue.put_nowait(item)
+                continue
+            except queue.Full:
+                pass
+            # one wait per transaction, however many events it has
+            if deadline is None:
+                deadline = time.monotonic() + self.enqueue_timeout
+            try:
+                self._queue.put(item, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                overflow = events[index:]
+                break
+        else:
+            return
+        if self._write(overflow, attempts=1):
+            with self._lock:
+                self.written_inline += len(overflow)
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self):
+        # block until every event submitted so far has been written
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            # linger briefly so a burst goes out as one INSERT and one commit
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch, attempts=WRITE_ATTEMPTS):
+        # returns whether the batch was written
+        for attempt in range(attempts):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(insert(AuditEvent.__table__), batch)
+                with self._lock:
+                    self.written += len(batch)
+                return True
+            except Exception:
+                if attempt + 1 < attempts:
+                    time.sleep(0.5 * (attempt + 1))
+        with self._lock:
+            self.failed += len(batch)
+        self.app.logger.exception('Could not write %d audit events: %s', len(batch),
+                                  json.dumps(batch, default=str))
+        return False
+
+    def close(self):
+        # stop the writer and write whatever is still queued; runs at interpreter
+        # exit, including a SIGTERM exit (_exit_on_sigterm)
+        if self._pid != os.getpid():
+            return
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=self.shutdown_timeout)
+            except queue.Full:
+                pass
+            self._thread.join(self.shutdown_timeout)
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            self._write(leftover[start:start + self.batch_size])
+
+
+def _exit_on_sigterm(signum, frame):
+    # raised in the main thread, so the atexit hooks (AuditWriter.close) run
+    raise SystemExit(128 + signum)
+
+
+def init_app(app):
+    if not app.config['AUDIT_LOG_ENABLED']:
+        app.extensions['audit'] = None
+        return
+    # signal handlers can only be set from the main thread; a server that
+    # handles SIGTERM itself keeps its handler
+    if (threading.current_thread() is threading.main_thread()
+            and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL):
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    app.extensions['audit'] = AuditWriter(
+        app,
+        app.config['AUDIT_QUEUE_SIZE'],
+        app.config['AUDIT_BATCH_SIZE'],
+        app.config['AUDIT_FLUSH_INTERVAL'],
+        app.config['AUDIT_ENQUEUE_TIMEOUT'],
+        app.config['AUDIT_SHUTDOWN_TIMEOUT'],
+    )
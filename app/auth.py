@@ -1,6 +1,6 @@
 from flask_jwt_extended import JWTManager, get_jwt_identity, get_jwt
 from functools import wraps
-from flask import jsonify
+from flask import current_app, jsonify
 
 jwt = JWTManager()
 
@@ -48,4 +48,15 @@ def expired_token_response(jwt_header, jwt_payload):
     return jsonify({'msg': 'Token has expired'}), 401
 
 
-# handle revoked tokens if you implement token revocation for logout functionality
+# revoked tokens (logout), see app/revocation.py
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return current_app.extensions['token_revocations'].is_revoked(jwt_payload['jti'])
+
+@jwt.revoked_token_loader
+def revoked_token_response(jwt_header, jwt_payload):
+    return jsonify({'msg': 'Token has been revoked'}), 401
+
+def revoke_current_token():
+    claims = get_jwt()
+    current_app.extensions['token_revocations'].revoke(claims['jti'], claims.get('exp'))
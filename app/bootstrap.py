@@ -0,0 +1,31 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.hashing import hash_password
+from app.models import Admin, db
+
+
+# one-off database setup, run from the CLI (`flask init-db`, `flask create-admin`)
+# instead of on every app start, so building the app never touches the database
+
+def create_schema():
+    # tables straight from the models, for throwaway databases (benchmarks,
+    # scratch copies); real databases are created and upgraded by the migrations
+    db.create_all()
+
+
+def create_admin(email, password, firstname, lastname, middlename=None):
+    # returns (admin, created); an existing admin with that email is left untouched
+    existing = db.session.execute(select(Admin).where(Admin.email == email)).scalar()
+    if existing is not None:
+        return existing, False
+    admin = Admin(firstname=firstname, middlename=middlename, lastname=lastname, email=email,
+                  password_hash=hash_password(password))
+    db.session.add(admin)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # created concurrently by another process
+        db.session.rollback()
+        return db.session.execute(select(Admin).where(Admin.email == email)).scalar_one(), False
+    return admin, True
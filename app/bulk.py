@@ -0,0 +1,328 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import stats
+from app.cache import bump_catalog_version
+from app.hashing import hash_passwords
+from app.models import Book, BookCategory, GradeLevel, Student, db
+
+
+# streaming bulk imports
+#
+# Uploads are parsed record by record straight from the request stream and
+# written in fixed-size batches: one set-based duplicate check and one
+# executemany INSERT per batch, committed per batch. Memory use depends on the
+# batch size, not on the size of the upload.
+#
+# Rows whose category or grade level doesn't exist are reported during
+# validation. If the database still rejects a batch (a concurrent upload
+# inserting the same ISBN or email meanwhile), its rows are inserted again one
+# at a time, so only the rows actually at fault are reported, with the reason.
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(request):
+    fmt = request.args.get('format')
+    if not fmt:
+        mimetype = request.mimetype or ''
+        if mimetype in ('text/csv', 'application/csv'):
+            fmt = 'csv'
+        elif mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+            fmt = 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        raise ImportFormatError('Upload must be CSV (text/csv) or NDJSON (application/x-ndjson)!')
+    return fmt
+
+
+def _decoded_lines(stream):
+    # decoded line by line (same as newline=''), so a bad byte is pinned to its line
+    for line in stream:
+        yield line.decode('utf-8')
+
+
+def iter_records(stream, fmt):
+    # yields (row_number, record or None, error or None)
+    if fmt == 'csv':
+        number = 0
+        try:
+            for number, record in enumerate(csv.DictReader(_decoded_lines(stream)), start=1):
+                yield number, record, None
+        except UnicodeDecodeError:
+            # a CSV field may span lines, so the reader cannot resynchronise:
+            # report it as a row error and stop, the rows already imported stay reported
+            yield number + 1, None, 'Invalid UTF-8, the rest of the upload was not read'
+        return
+
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except UnicodeDecodeError:
+            yield number, None, 'Invalid UTF-8'
+            continue
+        except ValueError:
+            yield number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield number, None, 'Each line must be a JSON object'
+            continue
+        yield number, record, None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _optional_int(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError(value)
+    number = int(value)
+    # an INTEGER column's range; anything bigger fails in the driver, not here
+    if not -2**31 <= number < 2**31:
+        raise ValueError(value)
+    return number
+
+
+def _text(record, name):
+    # a stripped string field, '' if absent; NDJSON can carry any JSON type
+    value = record.get(name)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string!')
+    return value.strip()
+
+
+def _book_row(record):
+    title = _text(record, 'title')
+    author = _text(record, 'author')
+    isbn = record.get('isbn')
+    # numeric ISBNs are accepted as their digits
+    if isinstance(isbn, bool) or not isinstance(isbn, (str, int, type(None))):
+        raise ValueError('isbn must be a string!')
+    isbn = str(isbn if isbn is not None else '').strip()
+    if not title or not author or not isbn:
+        raise ValueError('Title, author, and ISBN are required!')
+    try:
+        total_copies = _optional_int(record.get('total_copies'))
+        publication_year = _optional_int(record.get('publication_year'))
+        category_id = _optional_int(record.get('category_id'))
+    except (TypeError, ValueError):
+        raise ValueError('total_copies, publication_year and category_id must be integers!')
+    if total_copies is None:
+        total_copies = 1
+    if total_copies < 0:
+        raise ValueError('total_copies cannot be negative!')
+    return {
+        'title': title,
+        'author': author,
+        'isbn': isbn,
+        'publisher': _text(record, 'publisher') or None,
+        'publication_year': publication_year,
+        'category_id': category_id,
+        'total_copies': total_copies,
+        'available_copies': total_copies,
+    }
+
+
+def _known_ids(model, ids):
+    ids = {value for value in ids if value is not None}
+    return set(db.session.scalars(select(model.id).where(model.id.in_(ids)))) if ids else set()
+
+
+def _rejection(exc, duplicate):
+    # the reason a single row was refused, from the driver's message
+    message = str(exc.orig).splitlines()[0] if exc.orig is not None else str(exc)
+    if 'unique' in message.lower() or 'duplicate' in message.lower():
+        return duplicate
+    return f'Rejected by the database: {message}'
+
+
+def _insert_rows(model, counter, numbers, rows, report, key, duplicate):
+    # one executemany INSERT and commit; if the database refuses it, the rows
+    # again one by one, each committed, reporting those refused. Returns the
+    # number inserted.
+    try:
+        db.session.execute(insert(model), rows)
+        stats.adjust(db.session.connection(), {counter: len(rows)})
+        db.session.commit()
+        return len(rows)
+    except IntegrityError:
+        db.session.rollback()
+    inserted = 0
+    for number, row in zip(numbers, rows):
+        try:
+            db.session.execute(insert(model), [row])
+            stats.adjust(db.session.connection(), {counter: 1})
+            db.session.commit()
+            inserted += 1
+        except IntegrityError as exc:
+            db.session.rollback()
+            report.error(number, _rejection(exc, duplicate), **{key: row[key]})
+    return inserted
+
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+
+    def error(self, row, message, **extra):
+        self.failed += 1
+        # keep the report itself bounded for very dirty files
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'error': message, **extra})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.imported / elapsed, 1) if elapsed else None,
+        }
+
+
+def import_books(records, batch_size, max_errors):
+    report = ImportReport(max_errors)
+
+    for batch in batched(records, batch_size):
+        rows = []
+        numbers = []
+        seen = set()
+        for number, record, error in batch:
+            if error:
+                report.error(number, error)
+                continue
+            try:
+                row = _book_row(record)
+            except ValueError as exc:
+                report.error(number, str(exc), isbn=record.get('isbn'))
+                continue
+            if row['isbn'] in seen:
+                report.error(number, 'Duplicate ISBN in upload!', isbn=row['isbn'])
+                continue
+            seen.add(row['isbn'])
+            rows.append(row)
+            numbers.append(number)
+
+        if not rows:
+            continue
+
+        existing = set(db.session.scalars(select(Book.isbn).where(Book.isbn.in_(seen))))
+        categories = _known_ids(BookCategory, (row['category_id'] for row in rows))
+        new_rows, new_numbers = [], []
+        for number, row in zip(numbers, rows):
+            if row['isbn'] in existing:
+                report.error(number, 'A book with this ISBN already exists!', isbn=row['isbn'])
+            elif row['category_id'] is not None and row['category_id'] not in categories:
+                report.error(number, 'Unknown category_id!', isbn=row['isbn'])
+            else:
+                new_rows.append(row)
+                new_numbers.append(number)
+
+        if not new_rows:
+            continue
+        # executemany path; bypasses the ORM unit of work, so counters are bumped here
+        imported = _insert_rows(Book, 'total_books', new_numbers, new_rows, report, 'isbn',
+                                'A book with this ISBN already exists!')
+        if imported:
+            bump_catalog_version()
+            db.session.commit()
+        report.imported += imported
+
+    return report
+
+
+def _student_row(record):
+    firstname = _text(record, 'firstname')
+    lastname = _text(record, 'lastname')
+    email = _text(record, 'email')
+    # same field name as the register endpoints, which take the plain password in it
+    password = record.get('password_hash') or record.get('password')
+    if password is not None and not isinstance(password, str):
+        raise ValueError('password must be a string!')
+    if not all([firstname, lastname, email, password]):
+        raise ValueError('Missing required fields!')
+    try:
+        grade_level_id = _optional_int(record.get('grade_level_id'))
+    except (TypeError, ValueError):
+        raise ValueError('grade_level_id must be an integer!')
+    return {
+        'firstname': firstname,
+        'middlename': _text(record, 'middlename') or None,
+        'lastname': lastname,
+        'email': email,
+        'password': password,
+        'grade_level_id': grade_level_id,
+        'role': 'student',
+    }
+
+
+def import_students(app, records, batch_size, max_errors):
+    report = ImportReport(max_errors)
+
+    for batch in batched(records, batch_size):
+        rows = []
+        numbers = []
+        seen = set()
+        for number, record, error in batch:
+            if error:
+                report.error(number, error)
+                continue
+            try:
+                row = _student_row(record)
+            except ValueError as exc:
+                report.error(number, str(exc), email=record.get('email'))
+                continue
+            if row['email'] in seen:
+                report.error(number, 'Duplicate email in upload!', email=row['email'])
+                continue
+            seen.add(row['email'])
+            rows.append(row)
+            numbers.append(number)
+
+        if not rows:
+            continue
+
+        existing = set(db.session.scalars(select(Student.email).where(Student.email.in_(seen))))
+        grade_levels = _known_ids(GradeLevel, (row['grade_level_id'] for row in rows))
+        new_rows, new_numbers = [], []
+        for number, row in zip(numbers, rows):
+            if row['email'] in existing:
+                report.error(number, 'Email already registered!', email=row['email'])
+            elif row['grade_level_id'] is not None and row['grade_level_id'] not in grade_levels:
+                report.error(number, 'Unknown grade_level_id!', email=row['email'])
+            else:
+                new_rows.append(row)
+                new_numbers.append(number)
+
+        if not new_rows:
+            continue
+        # only hash passwords of rows that will actually be inserted
+        hashes = hash_passwords(app, [row.pop('password') for row in new_rows])
+        for row, password_hash in zip(new_rows, hashes):
+            row['password_hash'] = password_hash
+        report.imported += _insert_rows(Student, 'total_students', new_numbers, new_rows, report, 'email',
+                                        'Email already registered!')
+
+    return report
@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import LibraryStat, db
+
+
+# response cache for catalog reads
+#
+# Cached bodies are keyed on endpoint + query string + the catalog version, a
+# counter in library_stats that every catalog write bumps in its own
+# transaction (bump_catalog_version). A write therefore invalidates every
+# cached page at once, on every worker, without having to find the entries;
+# old versions simply age out of the LRU. Responses carry a strong ETag
+# (hash of the body) so clients revalidating with If-None-Match get a 304.
+#
+# Loan approvals and returns only bump the version when a title goes out of or
+# comes back in stock (app/circulation.py), not on every checkout, which would
+# empty the cache at desk rate. So whether a title is available, and the
+# ?available= filter, are always current. The available_copies count in a
+# cached page may miss the checkouts made since it was cached, so entries
+# expire after RESPONSE_CACHE_TTL seconds in both backends, and a count is
+# never more than that out of date.
+#
+# RESPONSE_CACHE_BACKEND = 'memory' (per process LRU bounded by
+# RESPONSE_CACHE_MAX_BYTES), 'redis' (shared, needs the redis package and
+# RESPONSE_CACHE_REDIS_URL) or None to disable.
+
+CATALOG_VERSION = 'catalog_version'
+
+
+class LRUCacheBackend:
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            etag, body, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self._size -= len(body)
+                return None
+            self._entries.move_to_end(key)
+            return etag, body
+
+    def set(self, key, etag, body):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._entries[key] = (etag, body, time.monotonic() + self.ttl)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class RedisCacheBackend:
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND = 'redis' needs the redis package installed")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self._client.get(f'response-cache:{key}')
+        if value is None:
+            return None
+        etag, _, body = value.partition(b'\n')
+        return etag.decode(), body
+
+    def set(self, key, etag, body):
+        self._client.set(f'response-cache:{key}', etag.encode() + b'\n' + body, ex=self.ttl)
+
+
+def init_app(app):
+    backend = app.config['RESPONSE_CACHE_BACKEND']
+    if backend == 'memory':
+        app.extensions['response_cache'] = LRUCacheBackend(app.config['RESPONSE_CACHE_MAX_BYTES'],
+                                                           app.config['RESPONSE_CACHE_TTL'])
+    elif backend == 'redis':
+        app.extensions['response_cache'] = RedisCacheBackend(app.config['RESPONSE_CACHE_REDIS_URL'],
+                                                             app.config['RESPONSE_CACHE_TTL'])
+    else:
+        app.extensions['response_cache'] = None
+
+
+def catalog_version():
+    return db.session.execute(
+        select(LibraryStat.value).where(LibraryStat.name == CATALOG_VERSION)
+    ).scalar() or 0
+
+
+def bump_catalog_version():
+    # call before committing a catalog change, so the bump commits with it;
+    # one upsert, so workers creating the counter at the same time don't collide
+    table = LibraryStat.__table__
+    connection = db.session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(table).values(name=CATALOG_VERSION, value=1)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['name'], set_={'value': table.c.value + 1}))
+
+
+def cached_catalog_response(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        backend = current_app.extensions['response_cache']
+        if backend is None:
+            return fn(*args, **kwargs)
+
+        # encoded, so ?q=a%26b=c and ?q=a&b=c stay different keys
+        query = urlencode(sorted(request.args.items(multi=True)))
+        key = f'{request.endpoint}:{catalog_version()}:{request.path}?{query}'
+
+        cached = backend.get(key)
+        if cached is None:
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            backend.set(key, etag, body)
+        else:
+            etag, body = cached
+            response = current_app.response_class(body, mimetype='application/json')
+
+        response.set_etag(etag)
+        # authenticated data: clients may keep it but must revalidate
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    return wrapper
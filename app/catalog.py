@@ -0,0 +1,19 @@
+from flask import request
+
+from app.models import Book
+from app.pagination import arg_flag
+
+
+# optional catalog filters shared by the admin and student book listings
+
+def filter_books(query):
+    category_id = request.args.get('category_id', None, type=int)
+    if category_id is not None:
+        query = query.filter(Book.category_id == category_id)
+
+    available = arg_flag('available')
+    if available is True:
+        query = query.filter(Book.available_copies > 0)
+    elif available is False:
+        query = query.filter(Book.available_copies <= 0)
+    return query
@@ -0,0 +1,309 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import case, select, update
+
+from app import analytics, audit, stats
+from app.cache import bump_catalog_version
+from app.models import Book, Loan, db
+from app.scheduler import claim_run, record_run
+
+
+# loan lifecycle with atomic inventory updates
+#
+# Every transition is a compare-and-set UPDATE on the loan (WHERE status = the
+# status we read) and every inventory change is a single conditional UPDATE on
+# the book (e.g. available_copies - 1 WHERE available_copies > 0). Nothing is
+# read-modify-written in Python and no rows are locked, so concurrent desk
+# activity on the same title can neither oversell copies nor lose updates.
+# Callers commit on success and roll back on LoanTransitionError.
+
+class LoanTransitionError(Exception):
+    status_code = 400
+
+
+class LoanNotFound(LoanTransitionError):
+    status_code = 404
+
+
+def _current(loan_id):
+    loan = db.session.execute(select(Loan.status, Loan.book_id).where(Loan.id == loan_id)).first()
+    if loan is None:
+        raise LoanNotFound('Loan not found!')
+    return loan
+
+
+def _set_status(loan_id, expected, **values):
+    result = db.session.execute(
+        update(Loan).where(Loan.id == loan_id, Loan.status == expected).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def take_copy(book_id):
+    # returns the copies left, or None if there was none to take
+    return db.session.execute(
+        update(Book).where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .returning(Book.available_copies).execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def put_back_copy(book_id):
+    # returns the copies now available, or None if the title was already full
+    return db.session.execute(
+        update(Book).where(Book.id == book_id, Book.available_copies < Book.total_copies)
+        .values(available_copies=Book.available_copies + 1)
+        .returning(Book.available_copies).execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def approve(loan_id, admin_id):
+    loan = _current(loan_id)
+    now = datetime.now(timezone.utc)
+    due = now + timedelta(days=current_app.config['LOAN_PERIOD_DAYS'])
+    if loan.status != 'pending' or not _set_status(loan_id, 'pending', status='approved', approved_date=now,
+                                                   due_date=due, admin_id=admin_id):
+        raise LoanTransitionError('Only pending loans can be approved!')
+    left = take_copy(loan.book_id)
+    if left is None:
+        raise LoanTransitionError('No copies of this book are available!')
+    stats.adjust(db.session.connection(), {'loans_pending': -1, 'loans_approved': 1, 'copies_on_loan': 1})
+    analytics.record('approved', [loan_id], now)
+    audit.record('loan.approve', 'loan', loan_id, book_id=loan.book_id, admin_id=admin_id)
+    if left == 0:
+        # the title just went out of stock (see app/cache.py)
+        bump_catalog_version()
+
+
+def reject(loan_id):
+    loan = _current(loan_id)
+    if loan.status != 'pending' or not _set_status(loan_id, 'pending', status='rejected'):
+        raise LoanTransitionError('Only pending loans can be rejected!')
+    stats.adjust(db.session.connection(), {'loans_pending': -1, 'loans_rejected': 1})
+    audit.record('loan.reject', 'loan', loan_id, book_id=loan.book_id)
+
+
+def return_loan(loan_id):
+    loan = _current(loan_id)
+    now = datetime.now(timezone.utc)
+    if loan.status not in stats.ON_LOAN_STATUSES or not _set_status(loan_id, loan.status, status='returned',
+                                                                     return_date=now):
+        raise LoanTransitionError('Only approved loans can be returned!')
+    deltas = {f'loans_{loan.status}': -1, 'loans_returned': 1}
+    # a returned book always goes back on the shelf; the guard only stops the
+    # count exceeding total_copies if the two were already inconsistent
+    available = put_back_copy(loan.book_id)
+    if available is not None:
+        deltas['copies_on_loan'] = -1
+    stats.adjust(db.session.connection(), deltas)
+    analytics.record('returned', [loan_id], now)
+    audit.record('loan.return', 'loan', loan_id, book_id=loan.book_id, previous_status=loan.status)
+    if available == 1:
+        # back in stock
+        bump_catalog_version()
+
+
+# batch decisions
+#
+# The same transitions applied to many loans with a handful of set-based
+# statements (one SELECT, one UPDATE per book set / status group, each with
+# RETURNING so every id gets an exact outcome) inside one transaction.
+
+BATCH_ACTIONS = ('approve', 'reject', 'return')
+
+
+def _per_book(counts):
+    # CASE books.id WHEN <id> THEN <count> ... so one UPDATE adjusts every title
+    return case(dict(counts), value=Book.id, else_=0)
+
+
+def _batch_approve(loans, outcomes, admin_id, deltas):
+    wanted = defaultdict(list)
+    for loan_id, (status, book_id) in loans.items():
+        if status == 'pending':
+            wanted[book_id].append(loan_id)
+        else:
+            outcomes[loan_id] = 'invalid_status'
+    if not wanted:
+        return False
+
+    # hand out the copies each title has left, oldest request first
+    available = dict(db.session.execute(
+        select(Book.id, Book.available_copies).where(Book.id.in_(wanted))).all())
+    granted = {}
+    for book_id, loan_ids in wanted.items():
+        loan_ids.sort()
+        copies = max(available.get(book_id) or 0, 0)
+        granted[book_id] = loan_ids[:copies]
+        for loan_id in loan_ids[copies:]:
+            outcomes[loan_id] = 'no_copies'
+    counts = {book_id: len(ids) for book_id, ids in granted.items() if ids}
+    if not counts:
+        return False
+
+    # take the copies first; a title whose count moved since the read above is skipped
+    left = dict(db.session.execute(
+        update(Book).where(Book.id.in_(counts), Book.available_copies >= _per_book(counts))
+        .values(available_copies=Book.available_copies - _per_book(counts))
+        .returning(Book.id, Book.available_copies).execution_options(synchronize_session=False)).all())
+    taken = set(left)
+    candidates = [loan_id for book_id in taken for loan_id in granted[book_id]]
+    for book_id in set(counts) - taken:
+        for loan_id in granted[book_id]:
+            outcomes[loan_id] = 'no_copies'
+
+    now = datetime.now(timezone.utc)
+    due = now + timedelta(days=current_app.config['LOAN_PERIOD_DAYS'])
+    approved = set(db.session.scalars(
+        update(Loan).where(Loan.id.in_(candidates), Loan.status == 'pending')
+        .values(status='approved', approved_date=now, due_date=due, admin_id=admin_id)
+        .returning(Loan.id).execution_options(synchronize_session=False)))
+
+    # loans changed by someone else meanwhile give their copy back
+    refund = Counter(loans[loan_id][1] for loan_id in candidates if loan_id not in approved)
+    if refund:
+        left.update(db.session.execute(
+            update(Book).where(Book.id.in_(refund))
+            .values(available_copies=Book.available_copies + _per_book(refund))
+            .returning(Book.id, Book.available_copies).execution_options(synchronize_session=False)).all())
+    for loan_id in candidates:
+        outcomes[loan_id] = 'approved' if loan_id in approved else 'conflict'
+    analytics.record('approved', approved, now)
+    for loan_id in sorted(approved):
+        audit.record('loan.approve', 'loan', loan_id, book_id=loans[loan_id][1], admin_id=admin_id, batch=True)
+
+    deltas.update({'loans_pending': -len(approved), 'loans_approved': len(approved),
+                   'copies_on_loan': len(approved)})
+    # any title left out of stock
+    return 0 in left.values()
+
+
+def _batch_reject(loans, outcomes, deltas):
+    candidates = [loan_id for loan_id, (status, _) in loans.items() if status == 'pending']
+    for loan_id, (status, _) in loans.items():
+        if status != 'pending':
+            outcomes[loan_id] = 'invalid_status'
+    if not candidates:
+        return False
+    rejected = set(db.session.scalars(
+        update(Loan).where(Loan.id.in_(candidates), Loan.status == 'pending')
+        .values(status='rejected').returning(Loan.id).execution_options(synchronize_session=False)))
+    for loan_id in candidates:
+        outcomes[loan_id] = 'rejected' if loan_id in rejected else 'conflict'
+    for loan_id in sorted(rejected):
+        audit.record('loan.reject', 'loan', loan_id, book_id=loans[loan_id][1], batch=True)
+    deltas.update({'loans_pending': -len(rejected), 'loans_rejected': len(rejected)})
+    return False
+
+
+def _batch_return(loans, outcomes, deltas):
+    by_status = defaultdict(list)
+    for loan_id, (status, _) in loans.items():
+        if status in stats.ON_LOAN_STATUSES:
+            by_status[status].append(loan_id)
+        else:
+            outcomes[loan_id] = 'invalid_status'
+
+    now = datetime.now(timezone.utc)
+    returned = set()
+    for status, candidates in by_status.items():
+        done = set(db.session.scalars(
+            update(Loan).where(Loan.id.in_(candidates), Loan.status == status)
+            .values(status='returned', return_date=now)
+            .returning(Loan.id).execution_options(synchronize_session=False)))
+        for loan_id in candidates:
+            outcomes[loan_id] = 'returned' if loan_id in done else 'conflict'
+        deltas[f'loans_{status}'] -= len(done)
+        returned |= done
+    if not returned:
+        return False
+    analytics.record('returned', returned, now)
+    for loan_id in sorted(returned):
+        audit.record('loan.return', 'loan', loan_id, book_id=loans[loan_id][1],
+                     previous_status=loans[loan_id][0], batch=True)
+
+    restocked, back_in_stock = _restock(Counter(loans[loan_id][1] for loan_id in returned))
+    deltas.update({'loans_returned': len(returned), 'copies_on_loan': -restocked})
+    return back_in_stock
+
+
+def _restock(counts):
+    # puts the returned copies back, never above total_copies (as put_back_copy
+    # does one at a time), and returns how many actually went back. Each title
+    # is a compare-and-set on the available_copies just read; titles changed
+    # meanwhile (RETURNING tells which) are read and tried again. Also returns
+    # whether any title came back in stock.
+    restocked, back_in_stock = 0, False
+    while counts:
+        current = {book_id: (available, total) for book_id, available, total in db.session.execute(
+            select(Book.id, Book.available_copies, Book.total_copies).where(Book.id.in_(counts)))}
+        increase = {}
+        for book_id, count in counts.items():
+            available, total = current.get(book_id, (0, 0))
+            if available < total:
+                increase[book_id] = min(count, total - available)
+        if not increase:
+            break
+        done = set(db.session.scalars(
+            update(Book).where(Book.id.in_(increase),
+                               Book.available_copies == case({book_id: current[book_id][0] for book_id in increase},
+                                                             value=Book.id))
+            .values(available_copies=Book.available_copies + _per_book(increase))
+            .returning(Book.id).execution_options(synchronize_session=False)))
+        restocked += sum(increase[book_id] for book_id in done)
+        back_in_stock = back_in_stock or any(current[book_id][0] <= 0 for book_id in done)
+        counts = {book_id: counts[book_id] for book_id in increase if book_id not in done}
+    return restocked, back_in_stock
+
+
+def batch(action, loan_ids, admin_id):
+    # returns {loan_id: outcome}; the caller commits
+    loan_ids = list(dict.fromkeys(loan_ids))
+    loans = {row.id: (row.status, row.book_id) for row in db.session.execute(
+        select(Loan.id, Loan.status, Loan.book_id).where(Loan.id.in_(loan_ids)))}
+    outcomes = {loan_id: 'not_found' for loan_id in loan_ids if loan_id not in loans}
+    deltas = Counter()
+
+    # each returns whether a title went out of or came back in stock
+    if action == 'approve':
+        stock_changed = _batch_approve(loans, outcomes, admin_id, deltas)
+    elif action == 'reject':
+        stock_changed = _batch_reject(loans, outcomes, deltas)
+    else:
+        stock_changed = _batch_return(loans, outcomes, deltas)
+
+    stats.adjust(db.session.connection(), deltas)
+    if stock_changed:
+        bump_catalog_version()
+    return {loan_id: outcomes[loan_id] for loan_id in loan_ids}
+
+
+# overdue sweeper
+#
+# Approved loans past their due date are moved to 'overdue' with one bulk
+# UPDATE, so the overdue listing and counters are plain status lookups. It runs
+# in every worker on a timer and from `flask sweep-overdue`; the claim in
+# job_runs keeps workers from repeating each other's work, and the UPDATE
+# itself only touches loans still 'approved', so overlapping runs are harmless.
+
+OVERDUE_SWEEP = 'overdue-sweep'
+
+
+def sweep_overdue(min_interval=0):
+    # returns the number of loans marked overdue, or None if skipped
+    if not claim_run(OVERDUE_SWEEP, min_interval):
+        return None
+    swept = db.session.scalars(
+        update(Loan).where(Loan.status == 'approved', Loan.due_date < datetime.now(timezone.utc))
+        .values(status='overdue').returning(Loan.id).execution_options(synchronize_session=False)
+    ).all()
+    for loan_id in swept:
+        audit.record('loan.overdue', 'loan', loan_id)
+    swept = len(swept)
+    stats.adjust(db.session.connection(), {'loans_approved': -swept, 'loans_overdue': swept})
+    record_run(OVERDUE_SWEEP, swept)
+    db.session.commit()
+    return swept
@@ -0,0 +1,147 @@
+import click
+from flask.cli import with_appcontext
+
+
+# flask CLI commands, registered in create_app
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    # creates a new database or upgrades an existing one to the latest schema
+    from flask_migrate import upgrade
+    upgrade()
+    click.echo('Database schema is up to date.')
+
+
+@click.command('create-admin')
+@click.option('--email', prompt=True)
+@click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True)
+@click.option('--firstname', prompt=True)
+@click.option('--lastname', prompt=True)
+@click.option('--middlename', default=None)
+@with_appcontext
+def create_admin_command(email, password, firstname, lastname, middlename):
+    from app.bootstrap import create_admin
+    admin, created = create_admin(email, password, firstname, lastname, middlename)
+    if created:
+        click.echo(f'Admin {admin.email} created.')
+    else:
+        click.echo(f'Admin {admin.email} already exists, left unchanged.')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    from app.search import rebuild_search_index
+    rebuild_search_index()
+    click.echo('Book search index rebuilt.')
+
+
+@click.command('reconcile-stats')
+@with_appcontext
+def reconcile_stats_command():
+    from app.stats import reconcile
+    drift = reconcile()
+    for name, (stored, actual) in sorted(drift.items()):
+        click.echo(f'{name}: {stored} -> {actual}')
+    click.echo(f'Dashboard statistics reconciled ({len(drift)} counters corrected).')
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    from flask import current_app
+    from app.query_plans import check_query_plans
+    failures = check_query_plans(current_app._get_current_object())
+    for url, scans in failures.items():
+        for table, detail in scans:
+            click.echo(f'{url}: full scan of {table} ({detail})')
+    if failures:
+        raise SystemExit(1)
+    click.echo('All endpoint queries use an index.')
+
+
+@click.command('enroll-students')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Defaults to the file extension.')
+@with_appcontext
+def enroll_students_command(path, fmt):
+    from flask import current_app
+    from app.bulk import import_students, iter_records
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    with open(path, 'rb') as stream:
+        report = import_students(current_app._get_current_object(), iter_records(stream, fmt),
+                                 current_app.config['IMPORT_BATCH_SIZE'],
+                                 current_app.config['IMPORT_MAX_REPORTED_ERRORS'])
+    result = report.to_dict()
+    for error in result['errors']:
+        click.echo(f"row {error['row']}: {error['error']} ({error.get('email')})", err=True)
+    click.echo(f"Enrolled {result['imported']} students, {result['failed']} failed "
+               f"in {result['elapsed_seconds']}s ({result['rows_per_second']} rows/s).")
+
+
+@click.command('sweep-overdue')
+@with_appcontext
+def sweep_overdue_command():
+    from app.circulation import sweep_overdue
+    swept = sweep_overdue()
+    click.echo(f'{swept} loans marked overdue.')
+
+
+@click.command('close-reading-room')
+@click.option('--older-than', type=float, default=0, show_default=True,
+              help='Only close sessions opened more than this many hours ago.')
+@with_appcontext
+def close_reading_room_command(older_than):
+    # checks everyone out at closing time, for the scans that never came
+    from datetime import datetime, timedelta, timezone
+    from app.models import db
+    from app.reading_room import close_open
+    closed = close_open(datetime.now(timezone.utc) - timedelta(hours=older_than))
+    db.session.commit()
+    click.echo(f'{closed} reading room sessions closed.')
+
+
+@click.command('backfill-analytics')
+@with_appcontext
+def backfill_analytics_command():
+    # rebuilds the report rollups from the full loan history; approvals and
+    # returns wait for it, and on SQLite give up after busy_timeout, so run it
+    # with circulation paused on large databases
+    import time
+    from app.analytics import backfill
+    started = time.perf_counter()
+    written = backfill()
+    click.echo(f"Analytics rebuilt in {time.perf_counter() - started:.1f}s "
+               f"({written['loan_rollups']} entity rows, {written['loan_daily_rollups']} days).")
+
+
+@click.command('sync-replicas')
+@click.option('--every', type=float, default=None,
+              help='Keep copying every N seconds, simulating replicas that lag by up to N seconds.')
+@with_appcontext
+def sync_replicas_command(every):
+    # local development: refresh SQLite read replicas from the primary
+    import time
+    from app.replicas import sync_sqlite_replicas
+    while True:
+        count = sync_sqlite_replicas()
+        click.echo(f'{count} replicas synced from the primary.')
+        if not every:
+            break
+        time.sleep(every)
+
+
+def init_app(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(create_admin_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(reconcile_stats_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(enroll_students_command)
+    app.cli.add_command(sweep_overdue_command)
+    app.cli.add_command(backfill_analytics_command)
+    app.cli.add_command(close_reading_room_command)
+    app.cli.add_command(sync_replicas_command)
@@ -4,21 +4,151 @@ from datetime import timedelta
 
 load_dotenv()
 
+
+def replica_binds(urls):
+    # DATABASE_REPLICA_URLS='url1,url2' -> {'replica_0': 'url1', 'replica_1': 'url2'}
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     # JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24) 
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///library.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # check connections before handing them out and replace them before a
+    # server/proxy idle timeout can close them under us
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+    # applied to every new SQLite connection (app/engine.py): WAL lets readers
+    # run alongside the single writer, synchronous=NORMAL only fsyncs at
+    # checkpoints, and busy_timeout makes writers queue instead of failing with
+    # 'database is locked'. Negative cache_size is in KiB.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+    }
+
+    # read replicas (app/replicas.py): GET requests of the admin and student
+    # APIs read from these binds, round robin. A user's reads stay on the
+    # primary for READ_YOUR_WRITES_SECONDS after they change something, so
+    # keep it above the replication lag; the client carries that deadline in
+    # the READ_YOUR_WRITES_COOKIE cookie, so it holds on every worker.
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('DATABASE_REPLICA_URLS'))
+    READ_REPLICAS = list(SQLALCHEMY_BINDS)
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    READ_YOUR_WRITES_COOKIE = 'read_primary_until'
+
+    # run the hot read endpoints' queries through an AsyncSession (aiosqlite
+    # or asyncpg, see app/async_reads.py) on ASYNC_DATABASE_URL, which
+    # defaults to the primary. Off unless ASYNC_READS=1.
+    ASYNC_READS = os.environ.get('ASYNC_READS', '').lower() in ('1', 'true', 'yes')
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+
+    # days between approving a loan and its due date
+    LOAN_PERIOD_DAYS = 14
+    # largest list accepted by /loans/batch
+    MAX_BATCH_LOANS = 1000
+    # largest list of kiosk scans accepted by /in_library_uses/batch
+    MAX_BATCH_SCANS = 1000
+
+    # list endpoints pagination (?limit=&after=)
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    # bulk imports: rows per INSERT/commit, and how many row errors to report back
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_MAX_REPORTED_ERRORS = 1000
+
+    # processes used to hash passwords for bulk enrollment, None means one per core
+    PASSWORD_HASH_PROCESSES = None
+    # per-request hashing (login/register): hashes running at once (None means
+    # half the cores) and how many more may wait before requests get a 503
+    PASSWORD_HASH_CONCURRENCY = None
+    PASSWORD_HASH_MAX_PENDING = 16
+
+    # login throttling token buckets: burst size and refill rate (tokens/second).
+    # Whole classrooms share one IP, so the per-IP bucket is generous.
+    LOGIN_IP_BURST = 60
+    LOGIN_IP_RATE = 5.0
+    LOGIN_ACCOUNT_BURST = 5
+    LOGIN_ACCOUNT_RATE = 0.2
+
+    # catalog response cache: 'memory', 'redis' or None to disable. Entries
+    # live RESPONSE_CACHE_TTL seconds in either backend, which bounds how far
+    # behind a cached available_copies count can be (app/cache.py)
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+
+    # logout blocklist: 'database' (shared by all workers) or 'memory' (single
+    # process); each sync re-reads the last RESCAN_ROWS ids, and the whole
+    # unexpired blocklist is reloaded every RELOAD_SECONDS (see app/revocation.py)
+    TOKEN_REVOCATION_STORE = os.environ.get('TOKEN_REVOCATION_STORE', 'database')
+    TOKEN_REVOCATION_SYNC_SECONDS = 2
+    TOKEN_REVOCATION_RESCAN_ROWS = 1000
+    TOKEN_REVOCATION_RELOAD_SECONDS = 300
+
+    # JSON encoder for responses (app/fastjson.py): 'default' (Flask's), 'orjson'
+    # or 'auto' for orjson when it is installed; orjson writes non-ASCII as raw
+    # UTF-8, so switching changes the response bytes and the catalog ETags
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'default')
+
+    # longest date range of the daily loans report (app/analytics.py)
+    ANALYTICS_MAX_DAYS = 366
+
+    # rows fetched per round trip by the streaming exports
+    EXPORT_CHUNK_SIZE = 1000
+
+    # write-behind audit log (app/audit.py): queue bound, events per INSERT,
+    # seconds the writer lingers to fill a batch, seconds a commit may block in
+    # all on a full queue before writing the rest inline, seconds allowed to
+    # drain at exit (normal exit or SIGTERM)
+    AUDIT_LOG_ENABLED = True
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_BATCH_SIZE = 500
+    AUDIT_FLUSH_INTERVAL = 0.1
+    AUDIT_ENQUEUE_TIMEOUT = 0.5
+    AUDIT_SHUTDOWN_TIMEOUT = 10
+
+    # per-endpoint latency/SQL/size metrics served at /api/admin/metrics, and
+    # an opt-in log of requests slower than SLOW_REQUEST_LOG_MS with their SQL
+    METRICS_ENABLED = True
+    SLOW_REQUEST_LOG_MS = int(os.environ['SLOW_REQUEST_LOG_MS']) if os.environ.get('SLOW_REQUEST_LOG_MS') else None
+
+    # seconds between dashboard counter reconciliations in each worker, 0 disables
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 600))
+    # seconds between overdue sweeps (shared by all workers), 0 disables
+    OVERDUE_SWEEP_INTERVAL = int(os.environ.get('OVERDUE_SWEEP_INTERVAL', 300))
 
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///library_dev.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///library_dev.db'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)  # 24 hours for development
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        **Config.SQLALCHEMY_ENGINE_OPTIONS,
+        'pool_size': 5,
+        'max_overflow': 10,
+    }
 
 class ProductionConfig(Config):
     DEBUG = False
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)   # 1 hour for production
+    # per worker process: keep pool_size + max_overflow times the number of
+    # workers below the database's connection limit
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        **Config.SQLALCHEMY_ENGINE_OPTIONS,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
 
 config = {
     'development': DevelopmentConfig,
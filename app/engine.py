@@ -0,0 +1,42 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app.models import db
+
+
+# engine tuning
+#
+# Pool settings come from SQLALCHEMY_ENGINE_OPTIONS in the config class and
+# SQLite connections get SQLITE_PRAGMAS on connect. In-memory SQLite runs on a
+# single shared connection (StaticPool), which takes no queue pool sizing.
+
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def configure(app):
+    # call before db.init_app, which builds the engines from these options
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            key: value for key, value in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items()
+            if key not in QUEUE_POOL_OPTIONS
+        }
+
+
+def sqlite_pragma_hook(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def init_app(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', sqlite_pragma_hook(pragmas))
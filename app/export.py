@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.models import Admin, Book, InLibraryUse, Loan, Student, db
+
+
+# streaming exports
+#
+# Rows are read from a server-side cursor in EXPORT_CHUNK_SIZE partitions of
+# plain column tuples (no ORM objects) and written to the response as they
+# arrive, so memory stays flat and the first bytes go out straight away no
+# matter how many rows are exported.
+
+class ExportArgumentError(ValueError):
+    pass
+
+
+LOAN_COLUMNS = ['id', 'student_id', 'student_name', 'book_id', 'book_title', 'status',
+                'loan_request_date', 'approved_date', 'due_date', 'return_date', 'approved_by']
+
+IN_LIBRARY_USE_COLUMNS = ['id', 'student_id', 'book_id', 'book_title', 'use_date', 'end_time']
+
+
+def export_format():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        raise ExportArgumentError('format must be ndjson or csv!')
+    return fmt
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportArgumentError(f'{name} must be an ISO date, e.g. 2026-01-31!')
+
+
+def loans_statement(student_id=None):
+    approver = aliased(Admin)
+    statement = (
+        select(
+            Loan.id, Loan.student_id,
+            (Student.firstname + ' ' + Student.lastname).label('student_name'),
+            Loan.book_id, Book.title.label('book_title'), Loan.status,
+            Loan.loan_request_date, Loan.approved_date, Loan.due_date, Loan.return_date,
+            approver.firstname.label('approved_by'),
+        )
+        .outerjoin(Student, Student.id == Loan.student_id)
+        .outerjoin(Book, Book.id == Loan.book_id)
+        .outerjoin(approver, approver.id == Loan.admin_id)
+    )
+    if student_id is not None:
+        statement = statement.where(Loan.student_id == student_id)
+
+    statuses = [status for status in request.args.get('status', '').split(',') if status]
+    if statuses:
+        statement = statement.where(Loan.status.in_(statuses))
+    date_from, date_to = _date_arg('from'), _date_arg('to')
+    if date_from:
+        statement = statement.where(Loan.loan_request_date >= date_from)
+    if date_to:
+        statement = statement.where(Loan.loan_request_date < date_to)
+    return statement.order_by(Loan.id)
+
+
+def in_library_uses_statement(student_id):
+    statement = (
+        select(InLibraryUse.id, InLibraryUse.student_id, InLibraryUse.book_id,
+               Book.title.label('book_title'), InLibraryUse.use_date, InLibraryUse.end_time)
+        .outerjoin(Book, Book.id == InLibraryUse.book_id)
+        .where(InLibraryUse.student_id == student_id)
+    )
+    date_from, date_to = _date_arg('from'), _date_arg('to')
+    if date_from:
+        statement = statement.where(InLibraryUse.use_date >= date_from)
+    if date_to:
+        statement = statement.where(InLibraryUse.use_date < date_to)
+    return statement.order_by(InLibraryUse.id)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _generate(statement, columns, fmt, chunk_size):
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for partition in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_value(value) for value in row] for row in partition)
+            yield buffer.getvalue()
+    else:
+        for partition in result.partitions():
+            yield ''.join(
+                json.dumps(dict(zip(columns, map(_value, row)))) + '\n' for row in partition
+            )
+    result.close()
+
+
+def stream_export(statement, columns, fmt, filename):
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(_generate(statement, columns, fmt, chunk_size)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}.{fmt}'},
+    )
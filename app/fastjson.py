@@ -0,0 +1,81 @@
+import dataclasses
+import decimal
+import importlib.util
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+
+# faster JSON responses
+#
+# JSON_PROVIDER = 'orjson' serializes responses with orjson (a compiled
+# encoder, several times faster than the stdlib one on large lists), 'default'
+# (the default) keeps Flask's provider, and 'auto' picks orjson when it is
+# installed. orjson is opt-in because its bytes differ from Flask's: keys are
+# sorted, dates are HTTP dates and Decimal/UUID are strings as before, but
+# non-ASCII text is written as raw UTF-8 where Flask writes \uXXXX escapes,
+# and the whitespace differs. The JSON decodes to the same values, yet the
+# catalog ETags (hashes of the body, app/cache.py) change, so switching
+# providers costs every client one full response per cached URL, and workers
+# sharing a Redis response cache should all use the same provider.
+#
+# dumps() and loads() take Flask's keyword arguments; anything orjson has no
+# option for (ensure_ascii, separators, cls, an indent other than 2, ...) is
+# handed to the stdlib provider rather than ignored.
+
+class OrjsonProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, date):
+            return http_date(value)
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        if dataclasses.is_dataclass(value):
+            return dataclasses.asdict(value)
+        if hasattr(value, '__html__'):
+            return str(value.__html__())
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+    def _dumps(self, obj, indent=False, sort_keys=True):
+        options = self._options
+        if sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            options |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=self._default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if kwargs or indent not in (None, 0, 2):
+            return super().dumps(obj, indent=indent, sort_keys=sort_keys, **kwargs)
+        return self._dumps(obj, indent=bool(indent), sort_keys=sort_keys).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # bytes straight into the response, no decode/encode round trip
+        return self._app.response_class(self._dumps(obj, indent, self.sort_keys) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    provider = app.config['JSON_PROVIDER']
+    if provider == 'auto':
+        provider = 'orjson' if importlib.util.find_spec('orjson') else 'default'
+    if provider == 'orjson':
+        if importlib.util.find_spec('orjson') is None:
+            raise RuntimeError("JSON_PROVIDER = 'orjson' needs the orjson package installed")
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# password hashing is deliberately CPU-bound, so it never runs on the request
+# thread directly:
+#
+# - per-request hashing and verification (login, register) goes through a small
+#   bounded thread pool (hashlib releases the GIL while hashing). At most
+#   PASSWORD_HASH_CONCURRENCY hashes run at once and at most
+#   PASSWORD_HASH_MAX_PENDING may be queued; beyond that callers get
+#   HashingBusy straight away instead of piling up behind each other, which
+#   leaves CPU for the rest of the API.
+# - bulk work (enrollment) is spread over a pool of processes so it uses
+#   every core. The pool is created lazily from a threaded worker, and forking
+#   a process that has other threads running can copy a lock held mid-update
+#   into the child, which then deadlocks; its processes are therefore started
+#   from a fork server (a clean single-threaded process), or spawned where
+#   there is none. Either way they import the entry script again (as run.py
+#   does, it may build the app but must keep anything else under
+#   `if __name__ == '__main__'`). A single password goes through the bounded pool above like
+#   any other hash.
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, concurrency, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(concurrency + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+
+def init_app(app):
+    concurrency = app.config.get('PASSWORD_HASH_CONCURRENCY') or max(1, (os.cpu_count() or 2) // 2)
+    app.extensions['password_hasher'] = PasswordHasher(concurrency, app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        return jsonify({'msg': 'Server is busy, please try again shortly!'}), 503, {'Retry-After': '1'}
+
+
+def hash_password(password):
+    return current_app.extensions['password_hasher'].hash(password)
+
+
+def verify_password(password_hash, password):
+    return current_app.extensions['password_hasher'].verify(password_hash, password)
+
+
+_process_pool = None
+_process_pool_workers = 1
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(app):
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _process_pool_workers = app.config.get('PASSWORD_HASH_PROCESSES') or os.cpu_count() or 1
+            _process_pool = ProcessPoolExecutor(max_workers=_process_pool_workers,
+                                                mp_context=multiprocessing.get_context(method))
+    return _process_pool
+
+
+def hash_passwords(app, passwords):
+    passwords = list(passwords)
+    if len(passwords) < 2:
+        # not worth a process round trip, but still bounded like any other hash
+        return [app.extensions['password_hasher'].hash(password) for password in passwords]
+    pool = _get_process_pool(app)
+    chunksize = max(1, len(passwords) // (_process_pool_workers * 4))
+    return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+from app.models import db
+
+
+# per-endpoint request metrics
+#
+# before/after_request hooks time every request, and cursor execute events on
+# the engines count the SQL it runs and the time spent in the database. Both
+# only touch a small object in `g`; the shared per-endpoint series are updated
+# once per request under one lock, so this stays on in production. Series are
+# per worker process and labelled by Flask endpoint (not path), which keeps the
+# label set bounded. render() produces the Prometheus text format served by
+# /api/admin/metrics.
+#
+# SLOW_REQUEST_LOG_MS (opt-in) logs requests slower than that with each SQL
+# statement they ran and its duration. Parameters are never logged.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_seconds = 0.0
+        self.responses = {}
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'statements', 'db_seconds', 'captured')
+
+    def __init__(self, capture):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.captured = [] if capture else None
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status, elapsed, current, size):
+        with self._lock:
+            series = self._endpoints.get((endpoint, method))
+            if series is None:
+                series = self._endpoints[(endpoint, method)] = EndpointMetrics()
+            series.latency.observe(elapsed)
+            series.statements.observe(current.statements)
+            if size is not None:
+                series.response_size.observe(size)
+            series.db_seconds += current.db_seconds
+            series.responses[status] = series.responses.get(status, 0) + 1
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                '# HELP library_http_request_duration_seconds Request latency.',
+                '# TYPE library_http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), series in endpoints:
+                lines.extend(series.latency.lines('library_http_request_duration_seconds',
+                                                  f'endpoint="{endpoint}",method="{method}"'))
+            lines += [
+                '# HELP library_http_request_sql_statements SQL statements executed per request.',
+                '# TYPE library_http_request_sql_statements histogram',
+            ]
+            for (endpoint, method), series in endpoints:
+                lines.extend(series.statements.lines('library_http_request_sql_statements',
+                                                     f'endpoint="{endpoint}",method="{method}"'))
+            lines += [
+                '# HELP library_http_response_size_bytes Response body size (streamed responses excluded).',
+                '# TYPE library_http_response_size_bytes histogram',
+            ]
+            for (endpoint, method), series in endpoints:
+                lines.extend(series.response_size.lines('library_http_response_size_bytes',
+                                                        f'endpoint="{endpoint}",method="{method}"'))
+            lines += [
+                '# HELP library_http_request_db_seconds_total Time spent executing SQL.',
+                '# TYPE library_http_request_db_seconds_total counter',
+            ]
+            for (endpoint, method), series in endpoints:
+                lines.append(f'library_http_request_db_seconds_total{{endpoint="{endpoint}",method="{method}"}} '
+                             f'{series.db_seconds}')
+            lines += [
+                '# HELP library_http_responses_total Responses by status code.',
+                '# TYPE library_http_responses_total counter',
+            ]
+            for (endpoint, method), series in endpoints:
+                for status, count in sorted(series.responses.items()):
+                    lines.append(f'library_http_responses_total{{endpoint="{endpoint}",method="{method}",'
+                                 f'status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _current():
+    return g.get('_request_metrics') if has_app_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    if current is None:
+        return
+    elapsed = time.perf_counter() - context._metrics_started
+    current.statements += 1
+    current.db_seconds += elapsed
+    if current.captured is not None:
+        current.captured.append((elapsed, statement))
+
+
+def watch_engine(app, engine):
+    # also called for the async reads engine (app/async_reads.py)
+    if app.extensions.get('metrics') is None:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        app.extensions['metrics'] = None
+        return
+    registry = app.extensions['metrics'] = MetricsRegistry()
+    slow_ms = app.config['SLOW_REQUEST_LOG_MS']
+
+    with app.app_context():
+        for engine in db.engines.values():
+            watch_engine(app, engine)
+
+    @app.before_request
+    def start_request_metrics():
+        g._request_metrics = RequestMetrics(capture=slow_ms is not None)
+
+    @app.after_request
+    def record_request_metrics(response):
+        current = g.pop('_request_metrics', None)
+        if current is None:
+            return response
+        elapsed = time.perf_counter() - current.started
+        registry.record(request.endpoint or 'unmatched', request.method, response.status_code,
+                        elapsed, current, response.content_length)
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            statements = ''.join(f'\n  {seconds * 1000:8.1f} ms  {statement}'
+                                 for seconds, statement in current.captured)
+            app.logger.warning('Slow request %s %s: %.1f ms, %d statements, %.1f ms in SQL%s',
+                               request.method, request.full_path, elapsed * 1000, current.statements,
+                               current.db_seconds * 1000, statements)
+        return response
+
+
+def render():
+    registry = current_app.extensions['metrics']
+    return registry.render() if registry is not None else ''
@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
 
-db = SQLAlchemy()
+from app.replicas import RoutingSession
+
+# RoutingSession sends reads of GET requests to the read replicas, if any
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Admin(db.Model):
     __tablename__ = 'admins'
@@ -86,7 +89,7 @@ class Book(db.Model):
 class LibraryMember(db.Model):
     __tablename__ = 'library_members'
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)  
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False, index=True)
     membership_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_active = db.Column(db.Boolean, default=True)
     
@@ -96,6 +99,14 @@ class LibraryMember(db.Model):
 
 class Loan(db.Model):
     __tablename__ = 'loans'
+    __table_args__ = (
+        db.Index('ix_loans_status_due_date', 'status', 'due_date'),  # overdue sweep
+        db.Index('ix_loans_status_id', 'status', 'id'),  # status listings paged by id
+        db.Index('ix_loans_student_id_request_date', 'student_id', 'loan_request_date'),  # student history
+        # a student's own history paged by id, and its summary counts read from the index alone
+        db.Index('ix_loans_student_id_id_status', 'student_id', 'id', 'status'),
+        db.Index('ix_loans_book_id', 'book_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False) 
     library_member_id = db.Column(db.Integer, db.ForeignKey('library_members.id'), nullable=False)
@@ -107,24 +118,18 @@ class Loan(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, approved, borrowed, returned, rejected, overdue
     
     admin_id = db.Column(db.Integer, db.ForeignKey('admins.id'), nullable=True)  
-    approved_by = db.relationship('Admin', foreign_keys=[admin_id])  
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'student_id': self.student_id,
-            'book_id': self.book_id,
-            'loan_request_date': self.loan_request_date.isoformat() if self.loan_request_date else None,
-            'approved_date': self.approved_date.isoformat() if self.approved_date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'return_date': self.return_date.isoformat() if self.return_date else None,
-            'status': self.status,
-            'approved_by': self.approved_by.firstname if self.approved_by else None
-        }
+    approved_by = db.relationship('Admin', foreign_keys=[admin_id])
 
 
 class InLibraryUse(db.Model):
     __tablename__ = 'in_library_uses'
+    __table_args__ = (
+        db.Index('ix_in_library_uses_student_id_use_date', 'student_id', 'use_date'),
+        db.Index('ix_in_library_uses_student_id_id', 'student_id', 'id'),  # a student's own history paged by id
+        # at most one open session per student and book; also finds open sessions (app/reading_room.py)
+        db.Index('uq_in_library_uses_open', 'student_id', 'book_id', unique=True,
+                 sqlite_where=db.text('end_time IS NULL'), postgresql_where=db.text('end_time IS NULL')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)  
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
@@ -133,4 +138,77 @@ class InLibraryUse(db.Model):
     
     # Relationships
     student = db.relationship('Student', backref='in_library_uses')
-    book = db.relationship('Book', backref='in_library_uses')
\ No newline at end of file
+    book = db.relationship('Book', backref='in_library_uses')
+
+
+class LibraryStat(db.Model):
+    __tablename__ = 'library_stats'
+    # one row per counter: dashboard statistics (app/stats.py) and the
+    # catalog version used by the response cache (app/cache.py)
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LoanRollup(db.Model):
+    __tablename__ = 'loan_rollups'
+    # all-time loan counts per book, book category and grade level, kept up to
+    # date by app/analytics.py; entity_id 0 stands for "none" (a book with no
+    # category, a student with no grade level)
+    __table_args__ = (
+        db.Index('ix_loan_rollups_dimension_approved', 'dimension', 'approved', 'entity_id'),  # top titles
+    )
+    dimension = db.Column(db.String(20), primary_key=True)  # book, category, grade_level
+    entity_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    returned = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LoanDailyRollup(db.Model):
+    __tablename__ = 'loan_daily_rollups'
+    # loans approved and returned per (UTC) day, app/analytics.py
+    day = db.Column(db.Date, primary_key=True)
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    returned = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AuditEvent(db.Model):
+    __tablename__ = 'audit_events'
+    # append-only trail of state changes, written behind by app/audit.py
+    __table_args__ = (
+        db.Index('ix_audit_events_entity_entity_id_id', 'entity', 'entity_id', 'id'),  # one record's trail
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    actor_role = db.Column(db.String(20), nullable=False)  # admin, student or system
+    actor_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(50), nullable=False)  # e.g. loan.approve
+    entity = db.Column(db.String(20), nullable=False)  # loan, book, membership
+    entity_id = db.Column(db.Integer, nullable=True)
+    details = db.Column(db.JSON, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+            'actor_role': self.actor_role,
+            'actor_id': self.actor_id,
+            'action': self.action,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'details': self.details
+        }
+
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+
+class JobRun(db.Model):
+    __tablename__ = 'job_runs'
+    # last run of each scheduled job, shared by all workers (app/scheduler.py)
+    name = db.Column(db.String(50), primary_key=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_result = db.Column(db.Integer, nullable=True)
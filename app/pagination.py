@@ -0,0 +1,47 @@
+from flask import current_app, request
+from sqlalchemy import Select
+
+from app.models import db
+
+
+# keyset (cursor) pagination shared by the list endpoints
+#
+# clients pass ?limit=<n>&after=<cursor> and get back a `next_cursor` which is
+# null once the last page has been reached. Seeking on an indexed key keeps every
+# page the same cost, unlike OFFSET which has to walk all the skipped rows.
+# With descending=True pages run newest first and the cursor means "older than".
+# `query` is either an ORM query or a select() of columns (app/projection.py);
+# `fetch` runs a select() and returns its rows (app/async_reads.py).
+
+def page_args():
+    default = current_app.config['DEFAULT_PAGE_SIZE']
+    maximum = current_app.config['MAX_PAGE_SIZE']
+    limit = request.args.get('limit', default, type=int)
+    limit = max(1, min(limit, maximum))
+    after = request.args.get('after', None, type=int)
+    return limit, after
+
+
+def keyset_page(query, key_column, limit, after=None, descending=False, fetch=None):
+    if after is not None:
+        query = query.filter(key_column < after if descending else key_column > after)
+    # fetch one extra row to know whether another page exists
+    query = query.order_by(key_column.desc() if descending else key_column).limit(limit + 1)
+    if not isinstance(query, Select):
+        rows = query.all()
+    elif fetch is not None:
+        rows = fetch(query)
+    else:
+        rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], key_column.key)
+    return rows, next_cursor
+
+
+def arg_flag(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes')
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.models import Admin, Book, InLibraryUse, Loan, Student
+
+
+# column projections for the list endpoints
+#
+# List endpoints select plain column rows rather than hydrating ORM objects,
+# and only the columns the response needs: ?fields=id,title narrows each item
+# to those keys (a sparse fieldset), and the SELECT to the matching columns and
+# joins. Items keep the keys and values the ORM serializers used to give, in
+# the same order; datetimes are sent as ISO strings.
+
+class FieldsArgumentError(ValueError):
+    pass
+
+
+class Projection:
+    def __init__(self, model, key, fields, joins=None):
+        # fields: {name: (column expression, join name or None)} in response order
+        # joins: {join name: function(statement) -> statement with that join}
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.joins = joins or {}
+        self._datetimes = {name for name, (column, _) in fields.items() if _is_datetime(column)}
+
+    def requested_fields(self):
+        value = request.args.get('fields')
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise FieldsArgumentError(f'fields must be a comma separated list of {", ".join(self.fields)}!')
+        # response order, each field once
+        return [name for name in self.fields if name in names]
+
+    def _selected(self, names):
+        # the paging key is always selected, the response only has `names`
+        return names if self.key.key in names else [self.key.key, *names]
+
+    def select(self, names):
+        selected = self._selected(names)
+        statement = select(*[self.fields[name][0].label(name) for name in selected]).select_from(self.model)
+        for join in dict.fromkeys(self.fields[name][1] for name in selected):
+            if join is not None:
+                statement = self.joins[join](statement)
+        return statement
+
+    def items(self, names, rows):
+        # the key, when not requested, is the first column: skip it
+        offset = len(self._selected(names)) - len(names)
+        dates = [index for index, name in enumerate(names) if name in self._datetimes]
+        if not offset and not dates:
+            return [dict(zip(names, row)) for row in rows]
+        items = []
+        for row in rows:
+            values = list(row[offset:])
+            for index in dates:
+                if values[index] is not None:
+                    values[index] = values[index].isoformat()
+            items.append(dict(zip(names, values)))
+        return items
+
+
+def _is_datetime(column):
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+BOOK_LIST = Projection(Book, Book.id, {
+    'id': (Book.id, None),
+    'title': (Book.title, None),
+    'author': (Book.author, None),
+    'isbn': (Book.isbn, None),
+    'available_copies': (Book.available_copies, None),
+})
+
+_approver = aliased(Admin)
+
+LOAN_LIST = Projection(Loan, Loan.id, {
+    'id': (Loan.id, None),
+    'student_id': (Loan.student_id, None),
+    'student_name': (Student.firstname + ' ' + Student.lastname, 'student'),
+    'book_id': (Loan.book_id, None),
+    'book_title': (Book.title, 'book'),
+    'loan_request_date': (Loan.loan_request_date, None),
+    'approved_date': (Loan.approved_date, None),
+    'due_date': (Loan.due_date, None),
+    'return_date': (Loan.return_date, None),
+    'status': (Loan.status, None),
+    'approved_by': (_approver.firstname, 'approver'),
+}, joins={
+    'student': lambda statement: statement.outerjoin(Student, Student.id == Loan.student_id),
+    'book': lambda statement: statement.outerjoin(Book, Book.id == Loan.book_id),
+    'approver': lambda statement: statement.outerjoin(_approver, _approver.id == Loan.admin_id),
+})
+
+IN_LIBRARY_USE_LIST = Projection(InLibraryUse, InLibraryUse.id, {
+    'id': (InLibraryUse.id, None),
+    'student_id': (InLibraryUse.student_id, None),
+    'book_id': (InLibraryUse.book_id, None),
+    'book_title': (Book.title, 'book'),
+    'use_date': (InLibraryUse.use_date, None),
+    'end_time': (InLibraryUse.end_time, None),
+}, joins={
+    'book': lambda statement: statement.outerjoin(Book, Book.id == InLibraryUse.book_id),
+})
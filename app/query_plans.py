@@ -0,0 +1,117 @@
+import re
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+
+from app.models import db
+
+
+# query-plan regression harness
+#
+# Calls each read endpoint through the test client (bypassing the response
+# cache, which would otherwise answer the measured call), captures every SQL
+# statement it issues and runs EXPLAIN on it. Any plan that reads a whole table
+# (SQLite "SCAN <table>" without an index, PostgreSQL "Seq Scan") is reported.
+# `flask check-query-plans` checks the configured database;
+# benchmarks/query_plans.py builds and seeds a throwaway one first, for CI.
+# Both exit non-zero on a regression.
+
+# (role, url) pairs; list endpoints are called with a cursor so the plan
+# reflects a keyset seek rather than the first page
+ENDPOINTS = [
+    ('admin', '/api/admin/dashboard'),
+    ('admin', '/api/admin/books?after=0'),
+    ('admin', '/api/admin/books?after=0&category_id=1&available=true'),
+    ('admin', '/api/admin/books/search?q=potter'),
+    ('admin', '/api/admin/loans?after=0'),
+    ('admin', '/api/admin/pending_loans?after=0'),
+    ('admin', '/api/admin/loans/overdue?after=0'),
+    ('admin', '/api/admin/loans/overdue?after=0&fields=id,due_date'),
+    ('admin', '/api/admin/loans/1'),
+    ('admin', '/api/admin/students/1/history'),
+    ('admin', '/api/admin/reports/top_books'),
+    ('admin', '/api/admin/reports/grade_levels'),
+    ('admin', '/api/admin/reports/categories'),
+    ('admin', '/api/admin/reports/daily_loans'),
+    ('admin', '/api/admin/audit?after=1000000'),
+    ('admin', '/api/admin/reading_room'),
+    ('admin', '/api/admin/audit?entity=loan&entity_id=1&after=1000000'),
+    ('student', '/api/student/profile'),
+    ('student', '/api/student/books?after=0'),
+    ('student', '/api/student/books/search?q=potter'),
+    ('student', '/api/student/books/1'),
+    ('student', '/api/student/loans_history'),
+    ('student', '/api/student/loans_history?after=1000000'),
+    ('student', '/api/student/loans_history?kind=in_library_uses&after=1000000'),
+]
+
+# tables that are always read in full and are small by construction
+ALLOWED_SCANS = {'library_stats'}
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)')
+_POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def _capture(app, role, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={'role': role})
+        # replicas included: GET requests may read from them
+        engines = list(db.engines.values())
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    # warm-up call so one-off initialisation isn't mistaken for the steady state
+    client.get(url, headers=headers)
+    cache = app.extensions['response_cache']
+    app.extensions['response_cache'] = None
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client.get(url, headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        app.extensions['response_cache'] = cache
+    return statements
+
+
+def _table_scans(connection, statement, parameters):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        scans = []
+        for row in rows:
+            detail = row[-1]
+            match = _SQLITE_SCAN.match(detail)
+            if match and not any(ok in detail for ok in ('USING', 'VIRTUAL TABLE', 'CONSTANT ROW')):
+                scans.append((match.group(1), detail))
+        return scans
+
+    if dialect == 'postgresql':
+        # small test tables make sequential scans look cheapest, so forbid them
+        # to see which indexes the planner *can* use
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+        return [(match.group(1), row[0]) for row in rows for match in [_POSTGRES_SCAN.search(row[0])] if match]
+
+    return []
+
+
+def check_query_plans(app, endpoints=ENDPOINTS):
+    # returns {url: [(table, plan detail), ...]} for endpoints with table scans
+    failures = {}
+    for role, url in endpoints:
+        statements = _capture(app, role, url)
+        with app.app_context():
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    for table, detail in _table_scans(connection, statement, parameters):
+                        if table not in ALLOWED_SCANS:
+                            failures.setdefault(url, []).append((table, detail))
+                connection.rollback()
+    return failures
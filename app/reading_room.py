@@ -0,0 +1,216 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, case, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import stats
+from app.models import Book, InLibraryUse, Student, db
+
+
+# reading room check-in/check-out
+#
+# A student scanning a book at a reading room kiosk opens an in-library use
+# (end_time NULL); scanning it again on the way out closes it. Kiosks send
+# their scans in batches, and every batch, however large, is applied with a
+# fixed handful of statements in one transaction:
+#
+#   one SELECT each for the students, books and sessions involved,
+#   one UPDATE closing every open session the batch checks out (CASE per id),
+#   one INSERT of the finished (checked in and out) sessions,
+#   one INSERT ... ON CONFLICT DO NOTHING of the sessions left open.
+#
+# Scans are replayed per student and book in scan order, so a batch may check
+# the same book in and out several times. Scans that change nothing are not
+# written: a check-in of a session already open or already recorded with the
+# same scan time (a double scan, or a kiosk resending a batch), its check-out
+# and a repeated check-out are duplicates, a check-out with no open session is
+# not_checked_in. A partial unique index
+# allows one open session per student and book, so concurrent kiosks cannot
+# open the same session twice. Occupancy is the reading_room_open counter
+# (app/stats.py), kept in step by every path here.
+
+_REPLAYED = object()
+
+CHECK_IN = 'check_in'
+CHECK_OUT = 'check_out'
+SCAN_ACTIONS = (CHECK_IN, CHECK_OUT)
+
+
+# single scans (desk and student self-service endpoints): message and HTTP status per outcome
+OUTCOME_RESPONSES = {
+    'checked_in': ('Book checked in to the reading room!', 201),
+    'checked_out': ('Book checked out of the reading room!', 200),
+    'duplicate': ('This book is already checked in!', 409),
+    'not_checked_in': ('This book is not checked in!', 409),
+    'not_found': ('Student or book not found!', 404),
+    'conflict': ('This session was closed meanwhile!', 409),
+}
+
+
+class ScanArgumentError(ValueError):
+    pass
+
+
+def is_id(value):
+    # bool is an int subclass, so true/false would pass as ids 1/0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _utc(value):
+    # SQLite hands back naive datetimes; everything here is UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def parse_scans(events, now=None):
+    # [{"action", "student_id", "book_id", "scanned_at"?}] -> [(action, student_id, book_id, scanned_at)]
+    now = now or datetime.now(timezone.utc)
+    scans = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or event.get('action') not in SCAN_ACTIONS:
+            raise ScanArgumentError(f'events[{index}]: action must be check_in or check_out!')
+        student_id, book_id = event.get('student_id'), event.get('book_id')
+        if not is_id(student_id) or not is_id(book_id):
+            raise ScanArgumentError(f'events[{index}]: student_id and book_id must be ids!')
+        scanned_at = now
+        if event.get('scanned_at') is not None:
+            try:
+                # a kiosk clock running ahead cannot date a scan in the future
+                scanned_at = min(_utc(datetime.fromisoformat(event['scanned_at'])), now)
+            except (TypeError, ValueError):
+                raise ScanArgumentError(f'events[{index}]: scanned_at must be an ISO datetime!')
+        scans.append((event['action'], student_id, book_id, scanned_at))
+    return scans
+
+
+def _insert_open(rows):
+    # the sessions that were actually opened, as {(student_id, book_id)}
+    dialect_insert = postgresql.insert if db.session.connection().dialect.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(InLibraryUse).values(rows).on_conflict_do_nothing(
+        index_elements=['student_id', 'book_id'], index_where=InLibraryUse.end_time.is_(None))
+    return set(db.session.execute(
+        statement.returning(InLibraryUse.student_id, InLibraryUse.book_id)).tuples())
+
+
+def ingest(scans):
+    # returns one outcome per scan, in order: checked_in, checked_out,
+    # duplicate, not_checked_in, not_found or conflict; the caller commits
+    outcomes = [None] * len(scans)
+    student_ids = {scan[1] for scan in scans}
+    book_ids = {scan[2] for scan in scans}
+    students = set(db.session.scalars(select(Student.id).where(Student.id.in_(student_ids))))
+    books = set(db.session.scalars(select(Book.id).where(Book.id.in_(book_ids))))
+
+    by_pair = defaultdict(list)
+    for index, (action, student_id, book_id, scanned_at) in enumerate(scans):
+        if student_id in students and book_id in books:
+            by_pair[student_id, book_id].append(index)
+        else:
+            outcomes[index] = 'not_found'
+    if not by_pair:
+        return outcomes
+
+    # sessions of these students that are open (the partial index) or began
+    # since the earliest scan (ix_in_library_uses_student_id_use_date), one
+    # index search per branch of the OR, narrowed to the scanned books here
+    sessions, recorded = {}, set()
+    student_ids = {pair[0] for pair in by_pair}
+    earliest = min(scans[index][3] for indexes in by_pair.values() for index in indexes)
+    for session_id, student_id, book_id, use_date, end_time in db.session.execute(
+        select(InLibraryUse.id, InLibraryUse.student_id, InLibraryUse.book_id, InLibraryUse.use_date,
+               InLibraryUse.end_time)
+        .where(or_(and_(InLibraryUse.student_id.in_(student_ids), InLibraryUse.end_time.is_(None)),
+                   and_(InLibraryUse.student_id.in_(student_ids), InLibraryUse.use_date >= earliest)))
+    ):
+        if (student_id, book_id) in by_pair:
+            recorded.add((student_id, book_id, _utc(use_date)))
+            if end_time is None:
+                sessions[student_id, book_id] = {'id': session_id, 'use_date': _utc(use_date)}
+
+    closes = {}  # open session id -> end_time
+    finished, opened = [], {}  # new rows closed within the batch / left open
+    checked_out_by = {}  # scan index -> open session id it closes
+    opened_by = {}  # pair -> scan index that opened it
+    for pair, indexes in by_pair.items():
+        current, previous = sessions.get(pair), None
+        indexes.sort(key=lambda index: (scans[index][3], index))
+        for index in indexes:
+            action, scanned_at = scans[index][0], scans[index][3]
+            if action == CHECK_IN:
+                if current is not None:
+                    outcomes[index] = 'duplicate'
+                    continue
+                if (*pair, scanned_at) in recorded:
+                    # resent: this session was written by an earlier batch
+                    outcomes[index], current, previous = 'duplicate', _REPLAYED, action
+                    continue
+                current = {'student_id': pair[0], 'book_id': pair[1], 'use_date': scanned_at, 'end_time': None}
+                opened[pair], opened_by[pair] = current, index
+                outcomes[index] = 'checked_in'
+            elif current is None:
+                # a repeated check-out scan, or one for a book that was never checked in
+                outcomes[index] = 'duplicate' if previous == CHECK_OUT else 'not_checked_in'
+            elif current is _REPLAYED or scanned_at < current['use_date']:
+                # closes a resent session, or is older than the open one (a stale resend)
+                outcomes[index] = 'duplicate'
+                if current is _REPLAYED:
+                    current = None
+            else:
+                end_time = scanned_at
+                if 'id' in current:
+                    closes[current['id']] = end_time
+                    checked_out_by[index] = current['id']
+                else:
+                    current['end_time'] = end_time
+                    finished.append(opened.pop(pair))
+                outcomes[index] = 'checked_out'
+                current = None
+            previous = action
+
+    deltas = {'reading_room_open': 0}
+    if closes:
+        closed = set(db.session.scalars(
+            update(InLibraryUse).where(InLibraryUse.id.in_(closes), InLibraryUse.end_time.is_(None))
+            .values(end_time=case(closes, value=InLibraryUse.id))
+            .returning(InLibraryUse.id).execution_options(synchronize_session=False)))
+        # closed by another kiosk meanwhile
+        for index, session_id in checked_out_by.items():
+            if session_id not in closed:
+                outcomes[index] = 'conflict'
+        deltas['reading_room_open'] -= len(closed)
+    if finished:
+        db.session.execute(insert(InLibraryUse), finished)
+    if opened:
+        inserted = _insert_open(list(opened.values()))
+        # opened by another kiosk meanwhile
+        for pair, index in opened_by.items():
+            if pair in opened and pair not in inserted:
+                outcomes[index] = 'duplicate'
+        deltas['reading_room_open'] += len(inserted)
+    stats.adjust(db.session.connection(), deltas)
+    return outcomes
+
+
+def scan(action, student_id, book_id):
+    # one scan, now; returns its outcome, the caller commits
+    return ingest([(action, student_id, book_id, datetime.now(timezone.utc))])[0]
+
+
+def close_open(before):
+    # checks out every session opened before `before` (e.g. at closing time);
+    # returns the number closed, the caller commits
+    closed = db.session.execute(
+        update(InLibraryUse).where(InLibraryUse.end_time.is_(None), InLibraryUse.use_date < before)
+        .values(end_time=datetime.now(timezone.utc)).execution_options(synchronize_session=False)
+    ).rowcount
+    stats.adjust(db.session.connection(), {'reading_room_open': -closed})
+    return closed
+
+
+def occupancy():
+    # open sessions from the counter; distinct readers from the open-session index,
+    # which only holds the sessions currently open
+    readers = db.session.execute(
+        select(func.count(func.distinct(InLibraryUse.student_id))).where(InLibraryUse.end_time.is_(None))
+    ).scalar()
+    return {'open_sessions': stats.snapshot()['reading_room_open'], 'readers': readers}
@@ -0,0 +1,163 @@
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt
+from flask_sqlalchemy.session import Session
+
+
+# read replica routing
+#
+# READ_REPLICAS names binds of SQLALCHEMY_BINDS holding read-only copies of the
+# primary. GET requests to the admin and student APIs read from one of them,
+# picked round robin per request; everything else (mutating requests, CLI
+# commands, scheduled jobs) uses the primary. Inside a GET request any write,
+# flush or SELECT ... FOR UPDATE moves the rest of the request to the primary,
+# so it reads what it wrote.
+#
+# Read-your-writes across requests: after a successful mutating request, that
+# user's reads stay on the primary for READ_YOUR_WRITES_SECONDS, which must
+# cover the replication lag. The deadline travels with the client as the
+# READ_YOUR_WRITES_COOKIE cookie (epoch seconds), so the next GET is routed to
+# the primary by whichever worker or host serves it. The worker that handled
+# the write also remembers the user itself (RecentWriters), which covers
+# clients that drop cookies as long as they come back to that worker. The
+# cookie is not signed: all a client can do by editing it is move its own
+# reads between primary and replica.
+#
+# The route is picked on the first query after the JWT has been verified, so
+# the token checks themselves always read the primary.
+
+READ_METHODS = ('GET', 'HEAD')
+REPLICA_BLUEPRINTS = ('admin', 'student')
+PRIMARY = None  # bind key of SQLALCHEMY_DATABASE_URI
+_UNDECIDED = object()
+_next_replica = itertools.count()
+
+
+class RecentWriters:
+    def __init__(self, seconds, max_keys=10000):
+        self.seconds = seconds
+        self.max_keys = max_keys
+        self._deadlines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        with self._lock:
+            self._deadlines.pop(key, None)
+            self._deadlines[key] = time.monotonic() + self.seconds
+            while len(self._deadlines) > self.max_keys:
+                self._deadlines.popitem(last=False)
+
+    def __contains__(self, key):
+        deadline = self._deadlines.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+
+def _user_key():
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        # the token hasn't been verified (yet) in this request
+        return None
+    if not claims:
+        return None
+    return f"{claims.get('role')}:{claims.get(current_app.config['JWT_IDENTITY_CLAIM'])}"
+
+
+def _wrote_recently():
+    # the deadline cookie set by _remember_writer, possibly on another worker
+    try:
+        deadline = float(request.cookies.get(current_app.config['READ_YOUR_WRITES_COOKIE'], 0))
+    except ValueError:
+        return False
+    return deadline > time.time()
+
+
+def use_primary():
+    # send the rest of this request's queries to the primary
+    g._db_route = PRIMARY
+
+
+def _route():
+    route = g.get('_db_route', _UNDECIDED)
+    if route is not _UNDECIDED:
+        return route
+    replicas = current_app.config['READ_REPLICAS']
+    if not replicas or request.method not in READ_METHODS or request.blueprint not in REPLICA_BLUEPRINTS:
+        route = PRIMARY
+    else:
+        user = _user_key()
+        if user is None:
+            return PRIMARY
+        if user in current_app.extensions['read_replicas'] or _wrote_recently():
+            route = PRIMARY
+        else:
+            route = replicas[next(_next_replica) % len(replicas)]
+    g._db_route = route
+    return route
+
+
+def _is_read(clause):
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    # db.session class (app/models.py)
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or not _is_read(clause):
+                use_primary()
+            else:
+                route = _route()
+                if route is not PRIMARY:
+                    return self._db.engines[route]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _remember_writer(response):
+    if request.method not in READ_METHODS and response.status_code < 400:
+        user = _user_key()
+        if user is not None:
+            current_app.extensions['read_replicas'].add(user)
+            seconds = current_app.config['READ_YOUR_WRITES_SECONDS']
+            response.set_cookie(current_app.config['READ_YOUR_WRITES_COOKIE'], f'{time.time() + seconds:.3f}',
+                                max_age=math.ceil(seconds), path='/api', secure=request.is_secure,
+                                httponly=True, samesite='Lax')
+    return response
+
+
+def sync_sqlite_replicas():
+    # local stand-in for replication: copy the primary SQLite file over each
+    # replica. Real replicas are kept up to date by the database itself.
+    from app.models import db
+    primary = db.engines[PRIMARY]
+    replicas = [db.engines[key] for key in current_app.config['READ_REPLICAS']]
+    if any(engine.dialect.name != 'sqlite' for engine in [primary, *replicas]):
+        raise RuntimeError('only SQLite replicas can be synced locally')
+    source = sqlite3.connect(primary.url.database)
+    try:
+        for replica in replicas:
+            target = sqlite3.connect(replica.url.database, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+    return len(replicas)
+
+
+def init_app(app):
+    replicas = app.config['READ_REPLICAS']
+    unknown = [key for key in replicas if key not in app.config.get('SQLALCHEMY_BINDS', {})]
+    if unknown:
+        raise RuntimeError(f'READ_REPLICAS names unknown binds: {", ".join(unknown)}')
+    if not replicas:
+        return
+    app.extensions['read_replicas'] = RecentWriters(app.config['READ_YOUR_WRITES_SECONDS'])
+    app.after_request(_remember_writer)
@@ -0,0 +1,122 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, or_, select
+
+from app.models import RevokedToken, db
+
+
+# revoked JWTs (logout)
+#
+# The blocklist check runs on every authenticated request, so it is always
+# answered from an in-process hash set. Entries only need to live until the
+# token's own `exp`, after which the JWT is rejected anyway and the entry is
+# evicted.
+#
+# TOKEN_REVOCATION_STORE = 'memory'   - single process only
+# TOKEN_REVOCATION_STORE = 'database' - revocations are also written to the
+#   revoked_tokens table; each worker pulls new rows at most every
+#   TOKEN_REVOCATION_SYNC_SECONDS, so a logout on one worker takes effect on the
+#   others within that window without a query per request.
+#
+# Ids are not a reliable high-water mark: on PostgreSQL a transaction holding a
+# lower id can commit after one with a higher id has already been synced. Each
+# sync therefore re-reads the last TOKEN_REVOCATION_RESCAN_ROWS ids as well
+# (already known jtis are skipped), and every TOKEN_REVOCATION_RELOAD_SECONDS
+# the whole unexpired blocklist is read again, which bounds how long even a
+# very late commit can go unseen.
+
+class MemoryRevocationStore:
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expires, jti = heapq.heappop(self._heap)
+            if self._expiry.get(jti) == expires:
+                del self._expiry[jti]
+
+    def revoke(self, jti, expires):
+        # expires: epoch seconds, None for tokens without an expiry
+        with self._lock:
+            if jti in self._expiry and self._expiry[jti] == expires:
+                return
+            self._expiry[jti] = expires
+            if expires is not None:
+                heapq.heappush(self._heap, (expires, jti))
+            self._evict(time.time())
+
+    def is_revoked(self, jti):
+        if jti not in self._expiry:
+            return False
+        with self._lock:
+            self._evict(time.time())
+            return jti in self._expiry
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+def _epoch(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DatabaseRevocationStore:
+    def __init__(self, sync_seconds, rescan_rows, reload_seconds):
+        self.sync_seconds = sync_seconds
+        self.rescan_rows = rescan_rows
+        self.reload_seconds = reload_seconds
+        self._local = MemoryRevocationStore()
+        self._last_id = 0
+        self._next_sync = 0
+        self._next_reload = 0
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires):
+        expires_at = datetime.fromtimestamp(expires, timezone.utc) if expires is not None else None
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+        # rows past their expiry are useless, clean them up on the (rare) write path
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now(timezone.utc)))
+        db.session.commit()
+        self._local.revoke(jti, expires)
+
+    def _sync(self):
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            query = select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            if time.monotonic() >= self._next_reload:
+                # everything still unexpired (ix_revoked_tokens_expires_at)
+                query = query.where(or_(RevokedToken.expires_at >= datetime.now(timezone.utc),
+                                        RevokedToken.expires_at.is_(None)))
+                self._next_reload = time.monotonic() + self.reload_seconds
+            else:
+                # new rows, and the recent ids again in case a lower id committed late
+                query = query.where(RevokedToken.id > self._last_id - self.rescan_rows)
+            for row in db.session.execute(query).all():
+                self._local.revoke(row.jti, _epoch(row.expires_at))
+                self._last_id = max(self._last_id, row.id)
+            self._next_sync = time.monotonic() + self.sync_seconds
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self._sync()
+        return self._local.is_revoked(jti)
+
+
+def init_app(app):
+    if app.config['TOKEN_REVOCATION_STORE'] == 'memory':
+        store = MemoryRevocationStore()
+    else:
+        store = DatabaseRevocationStore(app.config['TOKEN_REVOCATION_SYNC_SECONDS'],
+                                        app.config['TOKEN_REVOCATION_RESCAN_ROWS'],
+                                        app.config['TOKEN_REVOCATION_RELOAD_SECONDS'])
+    app.extensions['token_revocations'] = store
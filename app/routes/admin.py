@@ -1,48 +1,139 @@
 from datetime import datetime, timedelta, timezone
 from json import load
 
-from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
-from flask_jwt_extended import create_access_token, jwt_required
-from app.auth import admin_required
-from app.models import Admin, Book, InLibraryUse, Student, Loan, BookCategory, db, GradeLevel, LibraryMember
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from sqlalchemy import update
+from app import analytics, async_reads, audit, circulation, metrics, reading_room, stats
+from app.analytics import ReportArgumentError
+from app.auth import admin_required, revoke_current_token
+from app.cache import bump_catalog_version, cached_catalog_response
+from app.circulation import LoanTransitionError
+from app.reading_room import ScanArgumentError
+from app.export import (IN_LIBRARY_USE_COLUMNS, LOAN_COLUMNS, ExportArgumentError, export_format,
+                        in_library_uses_statement, loans_statement, stream_export)
+from app.hashing import hash_password, verify_password
+from app.throttle import login_rate_limited
+from app.bulk import ImportFormatError, detect_format, import_books, import_students, iter_records
+from app.catalog import filter_books
+from app.pagination import keyset_page, page_args
+from app.projection import BOOK_LIST, IN_LIBRARY_USE_LIST, LOAN_LIST, FieldsArgumentError
+from app.search import search_books
+from app.models import Admin, AuditEvent, Book, InLibraryUse, Student, Loan, BookCategory, db, GradeLevel, LibraryMember
 
 admin_bp = Blueprint('admin', __name__)
 
 # authenticated admin route
 
 @admin_bp.post('/login')
+@login_rate_limited
 def admin_login_required():
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'msg': 'Email and password are required!'}), 400
     email = data.get('email')
     password= data.get('password_hash')
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
+        return jsonify({'msg': 'Email and password are required!'}), 400
     
     admin = Admin.query.filter_by(email=email).first()
-    if admin and check_password_hash(admin.password_hash, password):
+    if admin and verify_password(admin.password_hash, password):
         access_token = create_access_token(identity=str(admin.id), additional_claims={'role': 'admin'}, expires_delta=timedelta(hours=24))
         return jsonify({'msg': 'Admin authenticated successfully!', 'access_token': access_token}), 200
     else:
         return jsonify({'msg': 'Invalid email or password'}), 401
 
 
+@admin_bp.post('/logout')
+@jwt_required()
+@admin_required
+def admin_logout():
+    revoke_current_token()
+    return jsonify({'msg': 'Logout successful!'}), 200
+
+
 # Books and Students management routes
 
 @admin_bp.get('/dashboard')
 @jwt_required()
 @admin_required
 def dashboard():
-    # get total books, students, and loans count
-    total_books = Book.query.count()
-    total_students = Student.query.count()
-    total_loans = Loan.query.count()
+    # counters are maintained incrementally (see app/stats.py), no table scans here
+    values = stats.snapshot(fetch=async_reads.fetch)
     return jsonify({
         'msg': 'Welcome to the admin dashboard!',
-        'total_books': total_books,
-        'total_students': total_students,
-        'total_loans': total_loans
+        'total_books': values['total_books'],
+        'total_students': values['total_students'],
+        'total_loans': values['total_loans'],
+        'loans_by_status': {status: values[f'loans_{status}'] for status in stats.LOAN_STATUSES},
+        'overdue_loans': values['loans_overdue'],
+        'copies_on_loan': values['copies_on_loan'],
+        'active_memberships': values['active_memberships'],
+        'reading_room_occupancy': values['reading_room_open']
     })
 
 
+# circulation analytics, read from the rollup tables only (app/analytics.py)
+
+@admin_bp.get('/reports/top_books')
+@jwt_required()
+@admin_required
+def report_top_books():
+    limit, _ = page_args()
+    return jsonify({'books': analytics.top_books(limit)})
+
+
+@admin_bp.get('/reports/grade_levels')
+@jwt_required()
+@admin_required
+def report_grade_levels():
+    return jsonify({'grade_levels': analytics.by_grade_level()})
+
+
+@admin_bp.get('/reports/categories')
+@jwt_required()
+@admin_required
+def report_categories():
+    return jsonify({'categories': analytics.by_category()})
+
+
+# ?from=&to= ISO dates, to exclusive; the last 30 days by default
+@admin_bp.get('/reports/daily_loans')
+@jwt_required()
+@admin_required
+def report_daily_loans():
+    try:
+        days = analytics.daily_loans()
+    except ReportArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    return jsonify({'days': days})
+
+
+# audit trail, newest first: everything, or one record's with ?entity=loan&entity_id=42
+@admin_bp.get('/audit')
+@jwt_required()
+@admin_required
+def audit_trail():
+    limit, after = page_args()
+    entity = request.args.get('entity')
+    entity_id = request.args.get('entity_id', None, type=int)
+    if (entity is None) != (entity_id is None):
+        return jsonify({'msg': 'entity and entity_id must be given together!'}), 400
+    query = AuditEvent.query
+    if entity is not None:
+        query = query.filter_by(entity=entity, entity_id=entity_id)
+    events, next_cursor = keyset_page(query, AuditEvent.id, limit, after, descending=True)
+    return jsonify({'events': [event.to_dict() for event in events], 'next_cursor': next_cursor})
+
+
+# per-endpoint request metrics (this worker), Prometheus text format
+@admin_bp.get('/metrics')
+@jwt_required()
+@admin_required
+def request_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 # Books management routes
 
 @admin_bp.post('/books/categories')
@@ -60,6 +151,7 @@ def add_category():
        
     new_category = BookCategory(name=name)
     db.session.add(new_category)
+    bump_catalog_version()
     db.session.commit()
 
     return jsonify({'msg': 'Book category added successfully!'}), 201
@@ -75,6 +167,7 @@ def edit_category(category_id):
     if not name:
         return jsonify({'msg': 'Category name is required!'}), 400
     category.name = name
+    bump_catalog_version()
     db.session.commit()
     return jsonify({'msg': 'Category updated successfully!'})
 
@@ -84,6 +177,7 @@ def edit_category(category_id):
 def delete_category(category_id):
     category = BookCategory.query.get_or_404(category_id)
     db.session.delete(category)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({'msg': 'Category deleted successfully!'})
 
@@ -91,10 +185,29 @@ def delete_category(category_id):
 @admin_bp.get("/books")
 @jwt_required()
 @admin_required
+@cached_catalog_response
 def list_books():
-    books = Book.query.all()
-    
-    return jsonify({'books':[book.to_dict() for book in books], 'count': len(books)})
+    limit, after = page_args()
+    try:
+        fields = BOOK_LIST.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    rows, next_cursor = keyset_page(filter_books(BOOK_LIST.select(fields)), Book.id, limit, after,
+                                    fetch=async_reads.fetch)
+    return jsonify({'books': BOOK_LIST.items(fields, rows), 'count': len(rows), 'next_cursor': next_cursor})
+
+
+@admin_bp.get('/books/search')
+@jwt_required()
+@admin_required
+@cached_catalog_response
+def admin_search_books():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'msg': 'Search query is required!'}), 400
+    limit, _ = page_args()
+    books = search_books(q, limit)
+    return jsonify({'books': [book.to_dict() for book in books], 'count': len(books)})
 
 
 @admin_bp.post('/books')
@@ -125,15 +238,44 @@ def add_book():
         available_copies=total_copies
     )
     db.session.add(new_book)
+    db.session.flush()
+    audit.record('book.add', 'book', new_book.id, isbn=isbn, total_copies=total_copies)
+    bump_catalog_version()
     db.session.commit()
        
     return jsonify({'msg': 'Book added successfully!'}), 201
 
+# bulk import: CSV with a header row or NDJSON, one book per row/line
+@admin_bp.post('/books/import')
+@jwt_required()
+@admin_required
+def import_books_file():
+    try:
+        fmt = detect_format(request)
+    except ImportFormatError as exc:
+        return jsonify({'msg': str(exc)}), 400
+
+    records = iter_records(request.stream, fmt)
+    report = import_books(records, current_app.config['IMPORT_BATCH_SIZE'],
+                          current_app.config['IMPORT_MAX_REPORTED_ERRORS'])
+    audit.record('book.import', 'book', None, format=fmt, imported=report.imported, failed=report.failed)
+    db.session.commit()
+    return jsonify({'msg': 'Book import finished!', **report.to_dict()})
+
+BOOK_UPDATE_FIELDS = ('title', 'author', 'isbn', 'publisher', 'publication_year', 'category_id', 'total_copies')
+
 @admin_bp.put('/books/update/<int:book_id>')
 @jwt_required()
 @admin_required
 def update_book(book_id):
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'msg': 'Book fields are required!'}), 400
+    total_copies = data.get('total_copies')
+    # checked before it reaches the UPDATE, which SQLite would run with any value
+    if total_copies is not None and (isinstance(total_copies, bool) or not isinstance(total_copies, int)
+                                     or not 0 <= total_copies < 2**31):
+        return jsonify({'msg': 'total_copies must be a whole number, 0 or more!'}), 400
     
     book = Book.query.get_or_404(book_id)
     
@@ -143,11 +285,21 @@ def update_book(book_id):
     book.publisher = data.get('publisher', book.publisher)
     book.publication_year = data.get('publication_year', book.publication_year)
     book.category_id = data.get('category_id', book.category_id)
-    total_copies = data.get('total_copies', book.total_copies)
-    if total_copies < (book.total_copies - book.available_copies):
-        return jsonify({'msg': 'Total copies cannot be less than the number of copies currently loaned out!'}), 400
-    book.total_copies = total_copies
-    book.available_copies = total_copies - (book.total_copies - book.available_copies)
+    if total_copies is not None:
+        # one conditional UPDATE against the current counts, so copies checked
+        # out or returned meanwhile are neither lost nor double counted
+        resized = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id, Book.total_copies - Book.available_copies <= total_copies)
+            .values(total_copies=total_copies, available_copies=Book.available_copies + (total_copies - Book.total_copies))
+            .execution_options(synchronize_session=False)
+        )
+        if resized.rowcount == 0:
+            db.session.rollback()
+            return jsonify({'msg': 'Total copies cannot be less than the number of copies currently loaned out!'}), 400
+    audit.record('book.update', 'book', book_id, fields=sorted(key for key in data if key in BOOK_UPDATE_FIELDS),
+                 total_copies=total_copies)
+    bump_catalog_version()
     db.session.commit()
     
     return jsonify({'msg': 'Book updated successfully!'})
@@ -158,6 +310,8 @@ def update_book(book_id):
 def delete_book(book_id):
     book = Book.query.get_or_404(book_id)
     db.session.delete(book)
+    audit.record('book.delete', 'book', book_id, isbn=book.isbn)
+    bump_catalog_version()
     db.session.commit()
     return jsonify({'msg': 'Book deleted successfully!'})
 
@@ -192,7 +346,7 @@ def register():
         middlename=middlename,
         lastname=lastname,
         email=email,
-        password_hash=generate_password_hash(password),  # In production, hash the password before storing
+        password_hash=hash_password(password),  # In production, hash the password before storing
         grade_level_id=grade_level_id,
         role=role
     )
@@ -202,6 +356,22 @@ def register():
     
     return jsonify({'msg': 'Student registered successfully!'}), 201
 
+# bulk enrollment: CSV with a header row or NDJSON, same fields as /register_student
+@admin_bp.post('/students/import')
+@jwt_required()
+@admin_required
+def import_students_file():
+    try:
+        fmt = detect_format(request)
+    except ImportFormatError as exc:
+        return jsonify({'msg': str(exc)}), 400
+
+    records = iter_records(request.stream, fmt)
+    report = import_students(current_app._get_current_object(), records,
+                             current_app.config['IMPORT_BATCH_SIZE'],
+                             current_app.config['IMPORT_MAX_REPORTED_ERRORS'])
+    return jsonify({'msg': 'Student enrollment finished!', **report.to_dict()})
+
 # update student information routes
 @admin_bp.put('/update_student/<int:student_id>')
 @jwt_required()
@@ -220,7 +390,7 @@ def update_student(student_id):
     student.grade_level_id = data.get('grade_level_id', student.grade_level_id)
     
     if data.get('password_hash'):
-        student.password_hash = generate_password_hash(data['password_hash'])
+        student.password_hash = hash_password(data['password_hash'])
     
     db.session.commit()
     
@@ -242,25 +412,48 @@ def delete_student(student_id):
 @jwt_required()
 @admin_required
 def student_history(student_id):
-    student_loans = Loan.query.filter_by(student_id=student_id).all()
-    student_in_library_uses = InLibraryUse.query.filter_by(student_id=student_id).all()
-     
-     
-    return jsonify({'history': {
-        'loans': [loan.to_dict() for loan in student_loans],
-        'in_library_uses': [use.to_dict() for use in student_in_library_uses]
-    }})  
+    history = {}
+    for kind, projection, owner in (('loans', LOAN_LIST, Loan.student_id),
+                                    ('in_library_uses', IN_LIBRARY_USE_LIST, InLibraryUse.student_id)):
+        fields = list(projection.fields)
+        statement = projection.select(fields).where(owner == student_id).order_by(projection.key)
+        history[kind] = projection.items(fields, db.session.execute(statement).all())
+    return jsonify({'history': history})
     
     
     
+# streamed export of a student's history, ?kind=loans|in_library_uses&format=ndjson|csv&from=&to=
+@admin_bp.get('/students/<int:student_id>/history/export')
+@jwt_required()
+@admin_required
+def export_student_history(student_id):
+    kind = request.args.get('kind', 'loans')
+    try:
+        fmt = export_format()
+        if kind == 'loans':
+            statement, columns = loans_statement(student_id), LOAN_COLUMNS
+        elif kind == 'in_library_uses':
+            statement, columns = in_library_uses_statement(student_id), IN_LIBRARY_USE_COLUMNS
+        else:
+            return jsonify({'msg': 'kind must be loans or in_library_uses!'}), 400
+    except ExportArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    return stream_export(statement, columns, fmt, f'student_{student_id}_{kind}')
+    
+    
 # Libaray membership management routes
 
 @admin_bp.post('/library_membership/<int:student_id>/activate')
 @jwt_required()
 @admin_required
 def activate_membership(student_id):
-    student = LibraryMember.query.get_or_404(student_id)
+    Student.query.get_or_404(student_id)
+    student = LibraryMember.query.filter_by(student_id=student_id).first()
+    if student is None:
+        student = LibraryMember(student_id=student_id, is_active=True)
+        db.session.add(student)
     student.is_active = True
+    audit.record('membership.activate', 'membership', student_id)
     db.session.commit()
     return jsonify({'msg': 'Library membership activated successfully!'})
 
@@ -268,8 +461,9 @@ def activate_membership(student_id):
 @jwt_required()
 @admin_required
 def deactivate_membership(student_id):
-    student = LibraryMember.query.get_or_404(student_id)
+    student = LibraryMember.query.filter_by(student_id=student_id).first_or_404()
     student.is_active = False
+    audit.record('membership.deactivate', 'membership', student_id)
     db.session.commit()
     return jsonify({'msg': 'Library membership deactivated successfully!'})
 
@@ -281,41 +475,95 @@ def deactivate_membership(student_id):
 @jwt_required()
 @admin_required
 def view_loans():
-    loans = Loan.query.all()
-    return jsonify({'loans': [loan.to_dict() for loan in loans], 'count': len(loans)})
+    limit, after = page_args()
+    try:
+        fields = LOAN_LIST.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    rows, next_cursor = keyset_page(LOAN_LIST.select(fields), Loan.id, limit, after, fetch=async_reads.fetch)
+    return jsonify({'loans': LOAN_LIST.items(fields, rows), 'count': len(rows), 'next_cursor': next_cursor})
+
+
+# streamed export of all loans, ?format=ndjson|csv&status=a,b&from=&to= (on loan_request_date)
+@admin_bp.get('/loans/export')
+@jwt_required()
+@admin_required
+def export_loans():
+    try:
+        fmt = export_format()
+        statement = loans_statement()
+    except ExportArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    return stream_export(statement, LOAN_COLUMNS, fmt, 'loans')
 
 
 @admin_bp.post('/loans/<int:loan_id>/approve')
 @jwt_required()
 @admin_required
 def approve_loan(loan_id):
-    
-    loan = Loan.query.get_or_404(loan_id)
-    if loan.status != 'pending':
-        return jsonify({'msg': 'Only pending loans can be approved!'}), 400
-    loan.status = 'approved'
-    loan.approved_date = datetime.now(timezone.utc)
-        # Set due date to 14 days from approval
-    loan.due_date = loan.approved_date + timedelta(days=14)
+    # status change and copy checkout are conditional UPDATEs, see app/circulation.py
+    try:
+        circulation.approve(loan_id, int(get_jwt_identity()))
+    except LoanTransitionError as exc:
+        db.session.rollback()
+        return jsonify({'msg': str(exc)}), exc.status_code
     db.session.commit()
     return jsonify({'msg': 'Loan approved successfully!'})
 
+# apply one decision to many loans in a single transaction:
+# {"action": "approve" | "reject" | "return", "loan_ids": [1, 2, 3]}
+@admin_bp.post('/loans/batch')
+@jwt_required()
+@admin_required
+def batch_loans():
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'msg': 'action and loan_ids are required!'}), 400
+    action = data.get('action')
+    loan_ids = data.get('loan_ids')
+    if action not in circulation.BATCH_ACTIONS:
+        return jsonify({'msg': 'action must be one of approve, reject or return!'}), 400
+    # bool is an int subclass, so true/false would pass as ids 1/0
+    if not isinstance(loan_ids, list) or not loan_ids or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in loan_ids):
+        return jsonify({'msg': 'loan_ids must be a non-empty list of loan ids!'}), 400
+    if len(loan_ids) > current_app.config['MAX_BATCH_LOANS']:
+        return jsonify({'msg': f"At most {current_app.config['MAX_BATCH_LOANS']} loans per batch!"}), 400
+
+    outcomes = circulation.batch(action, loan_ids, int(get_jwt_identity()))
+    db.session.commit()
+    summary = {}
+    for outcome in outcomes.values():
+        summary[outcome] = summary.get(outcome, 0) + 1
+    return jsonify({
+        'msg': 'Batch processed!',
+        'results': [{'loan_id': loan_id, 'outcome': outcome} for loan_id, outcome in outcomes.items()],
+        'summary': summary
+    })
+
 @admin_bp.get('/pending_loans')
 @jwt_required()
 @admin_required
 def view_pending_loans():
-    pending_loans = Loan.query.filter_by(status='pending').all()
-    return jsonify({'pending_loans': [loan.to_dict() for loan in pending_loans]})
+    limit, after = page_args()
+    try:
+        fields = LOAN_LIST.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    statement = LOAN_LIST.select(fields).where(Loan.status == 'pending')
+    rows, next_cursor = keyset_page(statement, Loan.id, limit, after)
+    return jsonify({'pending_loans': LOAN_LIST.items(fields, rows), 'next_cursor': next_cursor})
 
 
 @admin_bp.post('/loans/<int:loan_id>/reject')
 @jwt_required()
 @admin_required
 def reject_loan(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
-    if loan.status != 'pending':
-        return jsonify({'msg': 'Only pending loans can be rejected!'}), 400
-    loan.status = 'rejected'
+    try:
+        circulation.reject(loan_id)
+    except LoanTransitionError as exc:
+        db.session.rollback()
+        return jsonify({'msg': str(exc)}), exc.status_code
     db.session.commit()     
     return jsonify({'msg': 'Loan rejected successfully!'})
 
@@ -324,22 +572,88 @@ def reject_loan(loan_id):
 @jwt_required()
 @admin_required
 def return_book(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
-    if loan.status != 'approved':
-        return jsonify({'msg': 'Only approved loans can be returned!'}), 400
-    loan.status = 'returned'
-    loan.return_date = datetime.now(timezone.utc)
+    try:
+        circulation.return_loan(loan_id)
+    except LoanTransitionError as exc:
+        db.session.rollback()
+        return jsonify({'msg': str(exc)}), exc.status_code
     db.session.commit()
     return jsonify({'msg': 'Book returned successfully!'})
 
+# reading room: desk check-in/check-out and batched kiosk scans (app/reading_room.py)
+
+def _single_scan(action, data):
+    if not isinstance(data, dict):
+        return jsonify({'msg': 'student_id and book_id are required!'}), 400
+    student_id, book_id = data.get('student_id'), data.get('book_id')
+    if not reading_room.is_id(student_id) or not reading_room.is_id(book_id):
+        return jsonify({'msg': 'student_id and book_id are required!'}), 400
+    outcome = reading_room.scan(action, student_id, book_id)
+    db.session.commit()
+    msg, status = reading_room.OUTCOME_RESPONSES[outcome]
+    return jsonify({'msg': msg, 'outcome': outcome}), status
+
+
+@admin_bp.post('/in_library_uses/check_in')
+@jwt_required()
+@admin_required
+def check_in_book():
+    return _single_scan(reading_room.CHECK_IN, request.get_json())
+
+
+@admin_bp.post('/in_library_uses/check_out')
+@jwt_required()
+@admin_required
+def check_out_book():
+    return _single_scan(reading_room.CHECK_OUT, request.get_json())
+
+
+# kiosk scans, applied in one transaction:
+# {"events": [{"action": "check_in" | "check_out", "student_id": 1, "book_id": 2, "scanned_at": "<ISO>"}]}
+@admin_bp.post('/in_library_uses/batch')
+@jwt_required()
+@admin_required
+def batch_scans():
+    data = request.get_json()
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list) or not events:
+        return jsonify({'msg': 'events must be a non-empty list of scans!'}), 400
+    if len(events) > current_app.config['MAX_BATCH_SCANS']:
+        return jsonify({'msg': f"At most {current_app.config['MAX_BATCH_SCANS']} scans per batch!"}), 400
+    try:
+        scans = reading_room.parse_scans(events)
+    except ScanArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+
+    outcomes = reading_room.ingest(scans)
+    db.session.commit()
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome] = summary.get(outcome, 0) + 1
+    return jsonify({'msg': 'Scans processed!', 'outcomes': outcomes, 'summary': summary})
+
+
+@admin_bp.get('/reading_room')
+@jwt_required()
+@admin_required
+def reading_room_occupancy():
+    return jsonify(reading_room.occupancy())
+
 # overdue books routes
 
 @admin_bp.get('/loans/overdue')
 @jwt_required()
 @admin_required
 def view_overdue_loans():
-    loans = Loan.query.filter(Loan.status == 'approved', Loan.due_date < datetime.now(timezone.utc)).all()
-    return jsonify({'overdue_loans': [loan.to_dict() for loan in loans], 'count': len(loans)})
+    # loans past their due date are moved to 'overdue' by the sweeper (app/circulation.py)
+    limit, after = page_args()
+    try:
+        fields = LOAN_LIST.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    statement = LOAN_LIST.select(fields).where(Loan.status == 'overdue')
+    rows, next_cursor = keyset_page(statement, Loan.id, limit, after, fetch=async_reads.fetch)
+    return jsonify({'overdue_loans': LOAN_LIST.items(fields, rows), 'count': len(rows), 'next_cursor': next_cursor})
    
 
 # approve loan request route
@@ -359,7 +673,7 @@ def view_loan_details(loan_id):
             'return_date': loan.return_date,
             'due_date': loan.due_date,
             'admin_id': loan.admin_id,
-            'approved_by': loan.approved_by,
+            'approved_by': loan.approved_by.firstname if loan.approved_by else None,
             'status': loan.status
         }
     })
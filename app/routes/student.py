@@ -1,11 +1,18 @@
-import datetime
-from time import timezone
+from datetime import datetime, timezone
 
 from flask import Blueprint, request, jsonify
-from app.models import Student, Book, Loan
+from sqlalchemy import case, func, select
+from app import async_reads, audit, reading_room, stats
+from app.models import Student, Book, InLibraryUse, LibraryMember, Loan
 from app.models import db
-from werkzeug.security import check_password_hash, generate_password_hash
-from app.auth import student_required
+from app.auth import revoke_current_token, student_required
+from app.cache import cached_catalog_response
+from app.hashing import hash_password, verify_password
+from app.throttle import login_rate_limited
+from app.catalog import filter_books
+from app.pagination import keyset_page, page_args
+from app.projection import BOOK_LIST, IN_LIBRARY_USE_LIST, LOAN_LIST, FieldsArgumentError
+from app.search import search_books
 from flask_jwt_extended import create_access_token, get_jwt_identity, get_jwt_identity, jwt_required
 
 student_bp = Blueprint('student', __name__)
@@ -37,7 +44,7 @@ def register():
         middlename=middlename,
         lastname=lastname,
         email=email,
-        password_hash=generate_password_hash(password),  # In production, hash the password before storing
+        password_hash=hash_password(password),  # In production, hash the password before storing
         grade_level_id=grade_level_id,
         role=role
     )
@@ -50,12 +57,17 @@ def register():
 
 
 @student_bp.post('/login')
+@login_rate_limited
 def login():
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'msg': 'Email and password are required!'}), 400
     email = data.get('email')
     password = data.get('password_hash')
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
+        return jsonify({'msg': 'Email and password are required!'}), 400
     student = Student.query.filter_by(email=email).first()
-    if not student or not check_password_hash(student.password_hash, password):
+    if not student or not verify_password(student.password_hash, password):
         return jsonify({'msg': 'Invalid email or password!'}), 401
     
     access_token = create_access_token(identity=str(student.id), additional_claims={'role': student.role})
@@ -83,7 +95,7 @@ def view_profile():
 @jwt_required()
 @student_required
 def logout():
-    
+    revoke_current_token()
     return jsonify({'msg': 'Logout successful!'}), 200
 
 # book borrowing routes
@@ -92,27 +104,41 @@ def logout():
 @student_bp.get('/books')
 @jwt_required()
 @student_required
+@cached_catalog_response
 def view_books():
-    books = Book.query.all()
-    book_list = []
-    for book in books:
-        book_list.append({
-            'id': book.id,
-            'title': book.title,
-            'author': book.author,
-            'isbn': book.isbn,
-            'available_copies': book.available_copies
-        })
-    return jsonify({'books': book_list})    
+    limit, after = page_args()
+    try:
+        fields = BOOK_LIST.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+    rows, next_cursor = keyset_page(filter_books(BOOK_LIST.select(fields)), Book.id, limit, after,
+                                    fetch=async_reads.fetch)
+    return jsonify({'books': BOOK_LIST.items(fields, rows), 'next_cursor': next_cursor})
+
+# search the catalog by title, author, publisher or ISBN (prefix matching, best match first)
+@student_bp.get('/books/search')
+@jwt_required()
+@student_required
+@cached_catalog_response
+def search_catalog():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'msg': 'Search query is required!'}), 400
+    limit, _ = page_args()
+    books = search_books(q, limit)
+    return jsonify({'books': [book.to_dict() for book in books], 'count': len(books)})
 
 #  get specific book details
 @student_bp.get('/books/<int:book_id>')
 @jwt_required()
 @student_required
+@cached_catalog_response
 def view_book_details(book_id):
-    book = Book.query.get(book_id)
-    if not book:
+    rows = async_reads.fetch(select(Book.id, Book.title, Book.author, Book.isbn, Book.available_copies)
+                             .where(Book.id == book_id))
+    if not rows:
         return jsonify({'msg': 'Book not found!'}), 404
+    book = rows[0]
     
     return jsonify({
         'book': {
@@ -139,26 +165,84 @@ def borrow_book_request(book_id):
     if book.available_copies <= 0:
         return jsonify({'msg': 'Book is not available for borrowing!'}), 400
     
-    new_loan = {
-        'student_id': student_id,
-        'library_member_id': None,
-        'loan_request_date': datetime.now(timezone.utc),
-        'approved_date': None,
-        'return_date': None,
-        'due_date': None,  
-        'admin_id': None,  
-        'approved_by': None,  
-        'book_id': book_id,
-        'status': 'pending'
-        
-    }
+    membership = LibraryMember.query.filter_by(student_id=student_id, is_active=True).first()
+    if not membership:
+        return jsonify({'msg': 'An active library membership is required to borrow books!'}), 403
+    
+    # the copy itself is only taken, atomically, when the loan is approved
+    new_loan = Loan(
+        student_id=student_id,
+        library_member_id=membership.id,
+        loan_request_date=datetime.now(timezone.utc),
+        book_id=book_id,
+        status='pending'
+    )
     db.session.add(new_loan)
+    db.session.flush()
+    audit.record('loan.request', 'loan', new_loan.id, book_id=book_id)
     db.session.commit()
     
     return jsonify({'msg': 'Book loan request submitted successfully!'}), 201
 
 
+# reading room self-service: scan a book in and out of the reading room
+@student_bp.post('/in_library_uses/<int:book_id>/check_in')
+@jwt_required()
+@student_required
+def check_in_book(book_id):
+    return _scan(reading_room.CHECK_IN, book_id)
+
+
+@student_bp.post('/in_library_uses/<int:book_id>/check_out')
+@jwt_required()
+@student_required
+def check_out_book(book_id):
+    return _scan(reading_room.CHECK_OUT, book_id)
+
+
+def _scan(action, book_id):
+    outcome = reading_room.scan(action, int(get_jwt_identity()), book_id)
+    db.session.commit()
+    msg, status = reading_room.OUTCOME_RESPONSES[outcome]
+    return jsonify({'msg': msg, 'outcome': outcome}), status
+
+
+# the caller's own history, newest first: ?kind=loans|in_library_uses&limit=&after=&fields=
+# The first page also carries the loan summary, counted in one aggregate over
+# the (student_id, id, status) index rather than by loading rows.
 @student_bp.get('/loans_history')
+@jwt_required()
+@student_required
 def view_loans_history():
-    # Logic to retrieve the student's borrowing history from the database
-    return jsonify({'loans_history': []})  # Placeholder response
\ No newline at end of file
+    student_id = int(get_jwt_identity())
+    kind = request.args.get('kind', 'loans')
+    limit, after = page_args()
+
+    if kind == 'loans':
+        projection, owner = LOAN_LIST, Loan.student_id
+    elif kind == 'in_library_uses':
+        projection, owner = IN_LIBRARY_USE_LIST, InLibraryUse.student_id
+    else:
+        return jsonify({'msg': 'kind must be loans or in_library_uses!'}), 400
+    try:
+        fields = projection.requested_fields()
+    except FieldsArgumentError as exc:
+        return jsonify({'msg': str(exc)}), 400
+
+    statement = projection.select(fields).where(owner == student_id)
+    rows, next_cursor = keyset_page(statement, projection.key, limit, after, descending=True)
+    response = {kind: projection.items(fields, rows), 'next_cursor': next_cursor}
+    if after is None:
+        response['summary'] = loan_summary(student_id)
+    return jsonify(response)
+
+
+def loan_summary(student_id):
+    borrowed = stats.ON_LOAN_STATUSES + ('returned',)
+    active, overdue, total_borrowed, pending = db.session.query(
+        func.count(case((Loan.status.in_(stats.ON_LOAN_STATUSES), 1))),
+        func.count(case((Loan.status == 'overdue', 1))),
+        func.count(case((Loan.status.in_(borrowed), 1))),
+        func.count(case((Loan.status == 'pending', 1))),
+    ).filter(Loan.student_id == student_id).one()
+    return {'active': active, 'overdue': overdue, 'total_borrowed': total_borrowed, 'pending': pending}
@@ -0,0 +1,63 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import JobRun, db
+
+
+# minimal in-process periodic jobs; every worker runs its own copy, so jobs
+# scheduled here must be safe to run concurrently from several processes
+
+def schedule(app, name, interval, job):
+    if not interval:
+        return None
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            with app.app_context():
+                try:
+                    job()
+                except Exception:
+                    app.logger.exception('Scheduled job %s failed', name)
+
+    thread = threading.Thread(target=run, name=f'job-{name}', daemon=True)
+    thread.start()
+    app.extensions.setdefault('scheduled_jobs', {})[name] = stop
+    return stop
+
+
+def claim_run(name, min_interval):
+    # marks the job as run now unless any worker already did so in the last
+    # `min_interval` seconds; returns False when this run should be skipped.
+    # The check and the claim are one conditional UPDATE, so only one worker wins.
+    now = datetime.now(timezone.utc)
+    claimed = db.session.execute(
+        update(JobRun).where(
+            JobRun.name == name,
+            or_(JobRun.last_run_at.is_(None), JobRun.last_run_at <= now - timedelta(seconds=min_interval)),
+        ).values(last_run_at=now).execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed:
+        return True
+    if db.session.get(JobRun, name) is not None:
+        db.session.rollback()
+        return False
+    try:
+        db.session.add(JobRun(name=name, last_run_at=now))
+        db.session.flush()
+    except IntegrityError:
+        # another worker created the row first and so owns this run
+        db.session.rollback()
+        return False
+    return True
+
+
+def record_run(name, result):
+    db.session.execute(
+        update(JobRun).where(JobRun.name == name).values(last_result=result)
+        .execution_options(synchronize_session=False)
+    )
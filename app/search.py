@@ -0,0 +1,103 @@
+import re
+
+from sqlalchemy import DDL, event, or_, text
+
+from app.models import Book, db
+
+
+# full-text search over the book catalog
+#
+# SQLite: an external-content FTS5 table (books_fts) kept in sync with `books`
+# by triggers, so add_book/update_book/delete_book (and any bulk path) update
+# the index in the same transaction as the row itself.
+# PostgreSQL: a GIN index on a tsvector expression; the query below uses the
+# exact same expression so the planner can pick the index.
+
+_FTS_COLUMNS = 'title, author, publisher, isbn'
+
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    f"{_FTS_COLUMNS}, content='books', content_rowid='id', tokenize='unicode61')",
+
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    f"INSERT INTO books_fts(rowid, {_FTS_COLUMNS}) "
+    "VALUES (new.id, new.title, new.author, new.publisher, new.isbn); END",
+
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    f"INSERT INTO books_fts(books_fts, rowid, {_FTS_COLUMNS}) "
+    "VALUES ('delete', old.id, old.title, old.author, old.publisher, old.isbn); END",
+
+    # only the indexed columns, copy counts change far too often to reindex on
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, publisher, isbn ON books BEGIN "
+    f"INSERT INTO books_fts(books_fts, rowid, {_FTS_COLUMNS}) "
+    "VALUES ('delete', old.id, old.title, old.author, old.publisher, old.isbn); "
+    f"INSERT INTO books_fts(rowid, {_FTS_COLUMNS}) "
+    "VALUES (new.id, new.title, new.author, new.publisher, new.isbn); END",
+]
+
+_PG_VECTOR = (
+    "to_tsvector('simple', coalesce(books.title, '') || ' ' || coalesce(books.author, '') || ' ' "
+    "|| coalesce(books.publisher, '') || ' ' || coalesce(books.isbn, ''))"
+)
+
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_books_search ON books USING gin ({_PG_VECTOR})",
+]
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+# bm25 column weights, in _FTS_COLUMNS order
+_SQLITE_WEIGHTS = '10.0, 5.0, 2.0, 1.0'
+
+
+def _terms(q):
+    return re.findall(r'\w+', q or '', flags=re.UNICODE)
+
+
+def search_books(q, limit):
+    terms = _terms(q)
+    if not terms:
+        return []
+
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # every term must match, each as a prefix: "harr"* "pott"*
+        match = ' '.join(f'"{term}"*' for term in terms)
+        statement = text(
+            "SELECT books.* FROM books_fts JOIN books ON books.id = books_fts.rowid "
+            f"WHERE books_fts MATCH :match ORDER BY bm25(books_fts, {_SQLITE_WEIGHTS}), books.id LIMIT :limit"
+        ).bindparams(match=match, limit=limit)
+        return Book.query.from_statement(statement).all()
+
+    if dialect == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        statement = text(
+            f"SELECT books.* FROM books, to_tsquery('simple', :tsquery) AS query "
+            f"WHERE {_PG_VECTOR} @@ query "
+            f"ORDER BY ts_rank({_PG_VECTOR}, query) DESC, books.id LIMIT :limit"
+        ).bindparams(tsquery=tsquery, limit=limit)
+        return Book.query.from_statement(statement).all()
+
+    # no search index for this backend, fall back to substring matching
+    query = Book.query
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(Book.title.ilike(pattern), Book.author.ilike(pattern),
+                                 Book.publisher.ilike(pattern), Book.isbn.ilike(pattern)))
+    return query.order_by(Book.id).limit(limit).all()
+
+
+def rebuild_search_index():
+    # creates the index on databases that predate it and repopulates it
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            db.session.execute(text(statement))
+        db.session.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            db.session.execute(text(statement))
+    db.session.commit()
@@ -0,0 +1,176 @@
+from collections import Counter
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import Book, InLibraryUse, LibraryMember, LibraryStat, Loan, Student, db
+from app.replicas import use_primary
+
+
+# incrementally maintained dashboard counters
+#
+# ORM changes to books, students, loans and memberships are turned into counter
+# deltas in a before_flush hook and applied with `value = value + delta` on the
+# same connection, so the counters commit or roll back with the change itself.
+# Code that changes rows with Core UPDATE/INSERT statements (bypassing the ORM)
+# must call adjust() itself. reconcile() recomputes everything from scratch and
+# is run periodically to correct any drift; it locks the counters while it
+# counts, so it never loses an adjust() committed alongside it. Overdue loans are counted by their
+# 'overdue' status, which the overdue sweeper (app/circulation.py) maintains.
+
+LOAN_STATUSES = ('pending', 'approved', 'borrowed', 'returned', 'rejected', 'overdue')
+
+# loans that hold a copy of the book
+ON_LOAN_STATUSES = ('approved', 'borrowed', 'overdue')
+
+STAT_NAMES = (
+    'total_books', 'total_students', 'total_loans',
+    'copies_on_loan', 'active_memberships', 'reading_room_open',
+) + tuple(f'loans_{status}' for status in LOAN_STATUSES)
+
+
+def _old_new(obj, attr, default=None):
+    history = inspect(obj).attrs[attr].history
+    old = history.deleted[0] if history.deleted else (history.unchanged[0] if history.unchanged else default)
+    new = history.added[0] if history.added else old
+    return old, new
+
+
+def _on_loan(total, available):
+    return (total if total is not None else 1) - (available if available is not None else 1)
+
+
+def _deltas(session):
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Book):
+            deltas['total_books'] += 1
+            deltas['copies_on_loan'] += _on_loan(obj.total_copies, obj.available_copies)
+        elif isinstance(obj, Student):
+            deltas['total_students'] += 1
+        elif isinstance(obj, Loan):
+            deltas['total_loans'] += 1
+            deltas[f'loans_{obj.status or "pending"}'] += 1
+        elif isinstance(obj, LibraryMember):
+            if obj.is_active is not False:
+                deltas['active_memberships'] += 1
+        elif isinstance(obj, InLibraryUse):
+            if obj.end_time is None:
+                deltas['reading_room_open'] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            deltas['total_books'] -= 1
+            deltas['copies_on_loan'] -= _on_loan(obj.total_copies, obj.available_copies)
+        elif isinstance(obj, Student):
+            deltas['total_students'] -= 1
+        elif isinstance(obj, Loan):
+            deltas['total_loans'] -= 1
+            deltas[f'loans_{obj.status}'] -= 1
+        elif isinstance(obj, LibraryMember):
+            if obj.is_active:
+                deltas['active_memberships'] -= 1
+        elif isinstance(obj, InLibraryUse):
+            if obj.end_time is None:
+                deltas['reading_room_open'] -= 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Book):
+            old_total, new_total = _old_new(obj, 'total_copies')
+            old_available, new_available = _old_new(obj, 'available_copies')
+            deltas['copies_on_loan'] += _on_loan(new_total, new_available) - _on_loan(old_total, old_available)
+        elif isinstance(obj, Loan):
+            old, new = _old_new(obj, 'status')
+            if old != new:
+                deltas[f'loans_{old}'] -= 1
+                deltas[f'loans_{new}'] += 1
+        elif isinstance(obj, LibraryMember):
+            old, new = _old_new(obj, 'is_active')
+            if bool(old) != bool(new):
+                deltas['active_memberships'] += 1 if new else -1
+        elif isinstance(obj, InLibraryUse):
+            old, new = _old_new(obj, 'end_time')
+            if (old is None) != (new is None):
+                deltas['reading_room_open'] += 1 if new is None else -1
+
+    return deltas
+
+
+def adjust(connection, deltas):
+    table = LibraryStat.__table__
+    # in name order, the order reconcile() locks the rows in
+    for name, delta in sorted(deltas.items()):
+        if delta:
+            connection.execute(
+                update(table).where(table.c.name == name).values(value=table.c.value + delta)
+            )
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_changes(session, flush_context, instances):
+    deltas = _deltas(session)
+    if any(deltas.values()):
+        # Core statement on the session's connection: no autoflush, same transaction
+        adjust(session.connection(), deltas)
+
+
+def _compute():
+    values = dict.fromkeys(STAT_NAMES, 0)
+    values['total_books'], values['copies_on_loan'] = db.session.query(
+        func.count(Book.id),
+        func.coalesce(func.sum(Book.total_copies - Book.available_copies), 0),
+    ).one()
+    values['total_students'] = db.session.query(func.count(Student.id)).scalar()
+    values['active_memberships'] = db.session.query(func.count(LibraryMember.id)).filter(
+        LibraryMember.is_active.is_(True)).scalar()
+    values['reading_room_open'] = db.session.query(func.count(InLibraryUse.id)).filter(
+        InLibraryUse.end_time.is_(None)).scalar()
+
+    for status, count in db.session.query(Loan.status, func.count(Loan.id)).group_by(Loan.status):
+        values[f'loans_{status}'] = count
+        values['total_loans'] += count
+    return values
+
+
+def _lock_counters():
+    # makes adjust() in other transactions wait until this one commits, so the
+    # recount and the stored values describe the same moment: transitions that
+    # already adjusted are in both, later ones adjust on top of the result
+    table = LibraryStat.__table__
+    connection = db.session.connection()
+    dialect_insert = postgresql.insert if connection.dialect.name == 'postgresql' else sqlite.insert
+    # missing counters are created first; DO NOTHING, as another worker may be doing the same
+    connection.execute(dialect_insert(table).values([{'name': name, 'value': 0} for name in STAT_NAMES])
+                       .on_conflict_do_nothing(index_elements=['name']))
+    if connection.dialect.name == 'postgresql':
+        connection.execute(select(table.c.name).where(table.c.name.in_(STAT_NAMES))
+                           .order_by(table.c.name).with_for_update()).all()
+    # on SQLite the INSERT above already holds the database's single write lock
+
+
+def reconcile():
+    # correct every counter to freshly aggregated values; returns the
+    # counters that had drifted as {name: (stored, actual)}
+    # counted on the primary, a lagging replica would write stale totals back
+    use_primary()
+    _lock_counters()
+    actual = _compute()
+    table = LibraryStat.__table__
+    stored = dict(db.session.execute(select(table.c.name, table.c.value).where(table.c.name.in_(STAT_NAMES))).all())
+    drift = {name: (stored[name], value) for name, value in actual.items() if stored[name] != value}
+    # relative, like adjust(), rather than overwriting the stored value
+    adjust(db.session.connection(), {name: value - stored[name] for name, (_, value) in drift.items()})
+    db.session.commit()
+    return drift
+
+
+def snapshot(fetch=None):
+    # `fetch` runs a select() and returns its rows (app/async_reads.py)
+    statement = select(LibraryStat.name, LibraryStat.value)
+    values = dict(fetch(statement) if fetch is not None else db.session.execute(statement).all())
+    if any(name not in values for name in STAT_NAMES):
+        # counters were never initialised on this database
+        reconcile()
+        values = dict(db.session.execute(statement).all())
+    return values
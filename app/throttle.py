@@ -0,0 +1,68 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+
+# in-process token buckets for login throttling
+#
+# Each key (client IP or account email) gets a bucket of `capacity` tokens that
+# refills at `rate` tokens per second; an attempt costs one token. Rejections
+# are decided before any database lookup or password hashing, so a burst of
+# logins is turned away in microseconds. Buckets are per worker process.
+
+class TokenBucketLimiter:
+    def __init__(self, rate, capacity, max_keys=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        # returns 0 when allowed, otherwise the seconds until a token is available
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate if self.rate else math.inf
+            self._buckets[key] = (tokens, now)
+            # least recently seen keys are dropped first; a dropped key just starts full again
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def init_app(app):
+    app.extensions['login_limiters'] = {
+        'ip': TokenBucketLimiter(app.config['LOGIN_IP_RATE'], app.config['LOGIN_IP_BURST']),
+        'account': TokenBucketLimiter(app.config['LOGIN_ACCOUNT_RATE'], app.config['LOGIN_ACCOUNT_BURST']),
+    }
+
+
+def login_rate_limited(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        limiters = current_app.extensions['login_limiters']
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            # not a JSON object (e.g. a list): throttled by IP only, the view rejects it
+            data = {}
+        email = str(data.get('email') or '').strip().lower()
+
+        wait = limiters['ip'].acquire(f'{request.blueprint}:{request.remote_addr}')
+        if not wait and email:
+            wait = limiters['account'].acquire(f'{request.blueprint}:{email}')
+        if wait:
+            retry_after = str(math.ceil(wait)) if wait != math.inf else '60'
+            return jsonify({'msg': 'Too many login attempts, please try again later!'}), 429, {'Retry-After': retry_after}
+
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,119 @@
+# Sync vs async (ASYNC_READS) execution of the hot read endpoints.
+#
+# Seeds (or reuses) a synthetic database (benchmarks/dataset.py), checks that
+# the endpoints whose queries app/async_reads.py can run return the same bodies
+# in both modes, then drives them through a local threaded HTTP server, once
+# with the sync driver and once with ASYNC_READS on, with the same number of
+# concurrent clients. The response cache is turned off so both modes hit the
+# database on every request.
+#
+#   python benchmarks/async_reads.py --scale 0.1 --requests 500 --threads 16
+#   python benchmarks/async_reads.py --database /tmp/bench.db --threads 32
+#
+# Needs flask[async] and aiosqlite (asyncpg for a PostgreSQL --database URL).
+# Exits non-zero if a response differs between the modes.
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset  # noqa: E402  (benchmarks/dataset.py)
+from endpoints import run_http  # noqa: E402  (benchmarks/endpoints.py)
+
+
+def scenarios(app, counts, rng):
+    from flask_jwt_extended import create_access_token
+    from app.models import Admin, db
+
+    with app.app_context():
+        admin_id = db.session.execute(db.select(Admin.id).filter_by(email=dataset.ADMIN_EMAIL)).scalar_one()
+        admin = {'Authorization': 'Bearer ' + create_access_token(identity=str(admin_id),
+                                                                  additional_claims={'role': 'admin'})}
+        student = {'Authorization': 'Bearer ' + create_access_token(identity='1',
+                                                                    additional_claims={'role': 'student'})}
+
+    def get(path, headers):
+        return lambda: ('GET', path() if callable(path) else path, headers, None, None)
+
+    return {
+        'student.view_books': get(lambda: f'/api/student/books?after={rng.randint(0, counts["books"])}', student),
+        'student.view_book_details': get(lambda: f'/api/student/books/{rng.randint(1, counts["books"])}', student),
+        'admin.list_books': get(lambda: f'/api/admin/books?after={rng.randint(0, counts["books"])}', admin),
+        'admin.view_loans': get(lambda: f'/api/admin/loans?after={rng.randint(0, counts["loans"])}', admin),
+        'admin.view_overdue_loans': get('/api/admin/loans/overdue', admin),
+        'admin.dashboard': get('/api/admin/dashboard', admin),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async read endpoints under concurrency')
+    parser.add_argument('--database', help='existing seeded SQLite file or database URL (default: seed a new one)')
+    parser.add_argument('--scale', type=float, default=0.1, help='dataset size when seeding')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint and mode')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients')
+    args = parser.parse_args()
+
+    missing = [name for name in ('asgiref', 'aiosqlite') if importlib.util.find_spec(name) is None]
+    if missing:
+        raise SystemExit(f'missing {", ".join(missing)}: pip install "flask[async]" aiosqlite')
+
+    if args.database is None:
+        url = f'sqlite:///{os.path.join(tempfile.mkdtemp(prefix="async-reads-"), "library.db")}'
+    elif '://' in args.database:
+        url = args.database
+    else:
+        url = f'sqlite:///{os.path.abspath(args.database)}'
+    os.environ['DATABASE_URL'] = url
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = '0'
+    os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from app import create_app
+    from app.config import ProductionConfig, config
+
+    class SyncConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        RESPONSE_CACHE_BACKEND = None
+        ASYNC_READS = False
+
+    class AsyncConfig(SyncConfig):
+        ASYNC_READS = True
+
+    config['bench-sync'] = SyncConfig
+    config['bench-async'] = AsyncConfig
+
+    if args.database is None:
+        counts = dataset.seed(create_app('bench-sync'), args.scale)
+    else:
+        counts = dataset.counts_for(args.scale)
+
+    apps = {mode: create_app(f'bench-{mode}') for mode in ('sync', 'async')}
+    mismatched = 0
+    for endpoint, build in scenarios(apps['sync'], counts, random.Random(7)).items():
+        for _ in range(20):
+            _, path, headers, _, _ = build()
+            bodies = {mode: app.test_client().get(path, headers=headers).get_data() for mode, app in apps.items()}
+            if bodies['sync'] != bodies['async']:
+                mismatched += 1
+                print(f'{endpoint}: {path} differs between the modes')
+    if mismatched:
+        raise SystemExit(f'{mismatched} responses differ between sync and async reads')
+
+    results = {}
+    for mode, app in apps.items():
+        print(f'{mode}: {args.threads} clients, {args.requests} requests per endpoint', flush=True)
+        results[mode] = run_http(app, scenarios(app, counts, random.Random(42)), args.requests, args.threads)
+
+    print(f'\n{"endpoint":30}{"sync req/s":>12}{"async req/s":>12}{"sync p95":>10}{"async p95":>10}')
+    for endpoint in results['sync']:
+        sync, async_ = results['sync'][endpoint], results['async'][endpoint]
+        print(f'{endpoint:30}{sync["rps"]:>12}{async_["rps"]:>12}{sync["p95_ms"]:>10}{async_["p95_ms"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# Synthetic library dataset for the benchmarks.
+#
+# seed() fills an empty database with Core executemany INSERTs in batches (no
+# ORM objects), at full scale:
+#
+#   100k books in 40 categories, 20k students in 12 grade levels (all members),
+#   1M loans and 1M in-library uses spread over the last two years
+#
+# Loan statuses follow a plausible mix (mostly returned, some out, pending,
+# overdue and rejected) and every title's available_copies matches its loans
+# out, so the circulation endpoints behave as on a real database. Every
+# student's password is SEED_PASSWORD and the tables and an admin (ADMIN_EMAIL,
+# ADMIN_PASSWORD) are created first if missing. Afterwards the dashboard counters are
+# reconciled and, on SQLite, the planner statistics refreshed with ANALYZE.
+#
+#   python benchmarks/dataset.py --database /tmp/library-bench.db --scale 0.1
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED_PASSWORD = 'benchmark'
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'benchmark-admin'
+
+FULL_SCALE = {
+    'grade_levels': 12,
+    'book_categories': 40,
+    'books': 100_000,
+    'students': 20_000,
+    'loans': 1_000_000,
+    'in_library_uses': 1_000_000,
+}
+
+# (status, weight)
+LOAN_MIX = (('returned', 80), ('approved', 6), ('overdue', 3), ('pending', 6), ('rejected', 5))
+
+BATCH_SIZE = 10_000
+
+WORDS = ('history', 'garden', 'river', 'science', 'stars', 'ocean', 'mountain', 'dragon', 'city', 'music',
+         'secret', 'journey', 'winter', 'island', 'machine', 'forest', 'number', 'kingdom', 'light', 'shadow')
+
+
+def counts_for(scale):
+    return {name: max(1, int(count * scale)) if name in ('books', 'students', 'loans', 'in_library_uses')
+            else count for name, count in FULL_SCALE.items()}
+
+
+def _insert(table, rows):
+    # rows may be any iterable; it is consumed BATCH_SIZE rows at a time
+    from app.models import db
+    rows = iter(rows)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def _plan_loans(counts, rng):
+    # (status index, book id) of every loan, compact, so the titles' copies can
+    # be sized from the loans out before either table is written
+    statuses, weights = zip(*LOAN_MIX)
+    status_ids = array('b', rng.choices(range(len(statuses)), weights, k=counts['loans']))
+    book_ids = array('i', (rng.randint(1, counts['books']) for _ in range(counts['loans'])))
+    out = [0] * (counts['books'] + 1)
+    for status_id, book_id in zip(status_ids, book_ids):
+        if statuses[status_id] in ('approved', 'overdue'):
+            out[book_id] += 1
+    return status_ids, book_ids, out
+
+
+def _book_rows(counts, rng, out):
+    for book_id in range(1, counts['books'] + 1):
+        total = out[book_id] + rng.randint(0, 3) or 1
+        yield {
+            'id': book_id, 'title': ' '.join(rng.sample(WORDS, 3)).title(), 'author': f'Author {book_id % 5000}',
+            'isbn': f'978{book_id:010d}', 'publisher': f'Publisher {book_id % 200}',
+            'publication_year': rng.randint(1950, 2025), 'category_id': rng.randint(1, counts['book_categories']),
+            'total_copies': total, 'available_copies': total - out[book_id],
+        }
+
+
+def _loan_rows(counts, rng, now, status_ids, book_ids, admin_id):
+    statuses = [status for status, _ in LOAN_MIX]
+    span = 730 * 24 * 3600
+    for loan_id, (status_id, book_id) in enumerate(zip(status_ids, book_ids), start=1):
+        status = statuses[status_id]
+        student_id = rng.randint(1, counts['students'])
+        if status == 'pending':
+            requested = now - timedelta(seconds=rng.randint(0, 3 * 24 * 3600))
+        elif status == 'approved':
+            requested = now - timedelta(seconds=rng.randint(0, 13 * 24 * 3600))
+        elif status == 'overdue':
+            requested = now - timedelta(seconds=rng.randint(16 * 24 * 3600, 60 * 24 * 3600))
+        else:
+            requested = now - timedelta(seconds=rng.randint(16 * 24 * 3600, span))
+        approved = due = returned = approver = None
+        if status in ('approved', 'overdue', 'returned'):
+            approved = requested + timedelta(hours=rng.randint(1, 24))
+            due = approved + timedelta(days=14)
+            approver = admin_id
+            if status == 'returned':
+                returned = approved + timedelta(days=rng.randint(1, 20))
+        yield {
+            'id': loan_id, 'student_id': student_id, 'library_member_id': student_id, 'book_id': book_id,
+            'loan_request_date': requested, 'approved_date': approved, 'due_date': due,
+            'return_date': returned, 'status': status, 'admin_id': approver,
+        }
+
+
+def _in_library_use_rows(counts, rng, now):
+    for use_id in range(1, counts['in_library_uses'] + 1):
+        begun = now - timedelta(seconds=rng.randint(0, 730 * 24 * 3600))
+        yield {'id': use_id, 'student_id': rng.randint(1, counts['students']),
+               'book_id': rng.randint(1, counts['books']), 'use_date': begun,
+               'end_time': begun + timedelta(minutes=rng.randint(10, 120))}
+
+
+def seed(app, scale=1.0, seed_value=42, log=print):
+    from sqlalchemy import func, select, text
+    from werkzeug.security import generate_password_hash
+    from app import stats
+    from app.bootstrap import create_admin, create_schema
+    from app.models import (Book, BookCategory, GradeLevel, InLibraryUse, LibraryMember, Loan, Student, db)
+
+    counts = counts_for(scale)
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    with app.app_context():
+        create_schema()
+        if db.session.execute(select(func.count(Book.id))).scalar():
+            raise SystemExit('refusing to seed: the database already has books')
+        admin, _ = create_admin(ADMIN_EMAIL, ADMIN_PASSWORD, 'Bench', 'Admin')
+
+        _insert(GradeLevel.__table__, [{'id': i, 'name': f'Grade {i}'} for i in range(1, counts['grade_levels'] + 1)])
+        _insert(BookCategory.__table__, [{'id': i, 'name': f'Category {i}'}
+                                         for i in range(1, counts['book_categories'] + 1)])
+
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        _insert(Student.__table__, [{
+            'id': i, 'firstname': rng.choice(WORDS).title(), 'middlename': None, 'lastname': f'Student{i}',
+            'email': f'student{i}@bench.example.com', 'password_hash': password_hash, 'role': 'student',
+            'grade_level_id': rng.randint(1, counts['grade_levels']), 'created_at': now,
+        } for i in range(1, counts['students'] + 1)])
+        _insert(LibraryMember.__table__, [{'id': i, 'student_id': i, 'membership_date': now, 'is_active': True}
+                                          for i in range(1, counts['students'] + 1)])
+        log(f'students: {counts["students"]} ({time.perf_counter() - started:.1f}s)')
+
+        status_ids, book_ids, out = _plan_loans(counts, rng)
+        _insert(Book.__table__, _book_rows(counts, rng, out))
+        log(f'books: {counts["books"]} ({time.perf_counter() - started:.1f}s)')
+
+        _insert(Loan.__table__, _loan_rows(counts, rng, now, status_ids, book_ids, admin.id))
+        log(f'loans: {counts["loans"]} ({time.perf_counter() - started:.1f}s)')
+
+        _insert(InLibraryUse.__table__, _in_library_use_rows(counts, rng, now))
+        log(f'in-library uses: {counts["in_library_uses"]} ({time.perf_counter() - started:.1f}s)')
+
+        stats.reconcile()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+        log(f'seeded in {time.perf_counter() - started:.1f}s')
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a synthetic library dataset')
+    parser.add_argument('--database', required=True, help='SQLite file to create, or a database URL')
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of the full-size dataset')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database if '://' in args.database else f'sqlite:///{os.path.abspath(args.database)}'
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = '0'
+    os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from app import create_app
+    seed(create_app('production'), args.scale, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+# Per-endpoint latency and throughput for every admin and student route.
+#
+# Seeds (or reuses) a synthetic database (benchmarks/dataset.py), then drives
+# each route of admin_bp and student_bp twice:
+#
+#   test_client - sequentially through the Flask test client: the cost of the
+#                 application itself, no networking
+#   http        - through a local threaded HTTP server with --threads
+#                 concurrent clients, one route at a time
+#
+# and reports p50/p95/p99 latency and requests/second per endpoint. Results are
+# saved as JSON (with the git commit) so runs of different commits can be
+# compared with --compare:
+#
+#   python benchmarks/endpoints.py --scale 0.1 --requests 200 --threads 8
+#   python benchmarks/endpoints.py --database /tmp/bench.db --compare benchmarks/results/endpoints-<commit>.json
+#
+# Write routes consume rows prepared before timing (pending loans to approve,
+# throwaway books to delete, ...); a route whose pool runs dry stops early and
+# reports fewer requests. Routes of the blueprints with no scenario below are
+# listed as 'not covered'.
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset  # noqa: E402  (benchmarks/dataset.py)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+PREPARED_ROWS = 5000
+
+
+class Exhausted(Exception):
+    pass
+
+
+class Pool:
+    # ids prepared for write routes, shared by all client threads
+    def __init__(self, ids):
+        self._ids = list(ids)
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if not self._ids:
+                raise Exhausted()
+            return self._ids.pop()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+def summarize(latencies, statuses, elapsed):
+    return {
+        'requests': len(latencies),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+class Scenarios:
+    # one request builder per endpoint: returns (method, path, headers, body, content_type)
+
+    def __init__(self, app, counts, rng):
+        from flask_jwt_extended import create_access_token
+        from sqlalchemy import select
+        from app.models import Admin, Book, BookCategory, Loan, Student, db
+
+        self.app = app
+        self.counts = counts
+        self.rng = rng
+        self.unique = itertools.count()
+        self.run_id = f'{int(time.time())}'
+
+        with app.app_context():
+            self._token = lambda identity, role: create_access_token(identity=str(identity),
+                                                                      additional_claims={'role': role})
+            self.admin_id = db.session.execute(select(Admin.id).where(Admin.email == dataset.ADMIN_EMAIL)).scalar()
+            self.admin = {'Authorization': f'Bearer {self._token(self.admin_id, "admin")}'}
+            self.students = [
+                {'Authorization': f'Bearer {self._token(student_id, "student")}'}
+                for student_id in range(1, min(counts['students'], 200) + 1)
+            ]
+            self.max_book = db.session.execute(select(db.func.max(Book.id))).scalar()
+            self.max_student = db.session.execute(select(db.func.max(Student.id))).scalar()
+            self.max_loan = db.session.execute(select(db.func.max(Loan.id))).scalar()
+
+            def ids(status, limit=PREPARED_ROWS):
+                return db.session.scalars(select(Loan.id).where(Loan.status == status)
+                                          .order_by(Loan.id.desc()).limit(limit)).all()
+            pending = ids('pending', 3 * PREPARED_ROWS)
+            self.pending = Pool(pending[0::3])
+            self.rejectable = Pool(pending[1::3])
+            self.batch_pending = Pool(pending[2::3])
+            self.on_loan = Pool(ids('approved') + ids('overdue'))
+
+            # throwaway rows for the delete routes, without loans pointing at them
+            first = self.max_book + 1
+            db.session.execute(Book.__table__.insert(), [
+                {'id': first + i, 'title': 'Throwaway', 'author': 'Bench', 'isbn': f'tmp-{self.run_id}-{i}',
+                 'total_copies': 1, 'available_copies': 1} for i in range(PREPARED_ROWS)])
+            self.deletable_books = Pool(range(first, first + PREPARED_ROWS))
+            first = self.max_student + 1
+            db.session.execute(Student.__table__.insert(), [
+                {'id': first + i, 'firstname': 'Throwaway', 'lastname': 'Bench', 'password_hash': 'x',
+                 'email': f'tmp-{self.run_id}-{i}@bench.example.com'} for i in range(PREPARED_ROWS)])
+            self.deletable_students = Pool(range(first, first + PREPARED_ROWS))
+            categories = [{'name': f'tmp-{self.run_id}-{i}'} for i in range(PREPARED_ROWS)]
+            db.session.execute(BookCategory.__table__.insert(), categories)
+            self.deletable_categories = Pool(db.session.scalars(
+                select(BookCategory.id).where(BookCategory.name.like(f'tmp-{self.run_id}-%'))).all())
+            db.session.commit()
+
+    def _token_headers(self, identity, role):
+        with self.app.app_context():
+            return {'Authorization': f'Bearer {self._token(identity, role)}'}
+
+    def book(self):
+        return self.rng.randint(1, self.max_book)
+
+    def student(self):
+        return self.rng.randint(1, self.max_student)
+
+    def name(self, prefix):
+        return f'{prefix}-{self.run_id}-{next(self.unique)}'
+
+    def build(self):
+        rng = self.rng
+        json_body = 'application/json'
+
+        def csv_books():
+            return 'title,author,isbn,total_copies\n' + ''.join(
+                f'Imported,Bench,i{self.run_id[-6:]}-{next(self.unique)},2\n' for _ in range(100))
+
+        def csv_students():
+            return 'firstname,lastname,email,password\n' + ''.join(
+                f'Imported,Bench,{self.name("enr")}@bench.example.com,secret\n' for _ in range(10))
+
+        return {
+            # student_bp
+            'student.register': lambda: ('POST', '/api/student/register', {}, {
+                'firstname': 'Bench', 'lastname': 'Student', 'email': f'{self.name("reg")}@bench.example.com',
+                'password_hash': 'secret'}, json_body),
+            'student.login': lambda: ('POST', '/api/student/login', {}, {
+                'email': f'student{self.rng.randint(1, self.counts["students"])}@bench.example.com',
+                'password_hash': dataset.SEED_PASSWORD}, json_body),
+            'student.view_profile': lambda: ('GET', '/api/student/profile', rng.choice(self.students), None, None),
+            'student.logout': lambda: ('PUT', '/api/student/logout',
+                                       self._token_headers(self.student(), 'student'), None, None),
+            'student.view_books': lambda: ('GET', f'/api/student/books?after={self.book()}',
+                                           rng.choice(self.students), None, None),
+            'student.search_catalog': lambda: ('GET', f'/api/student/books/search?q={rng.choice(dataset.WORDS)}',
+                                               rng.choice(self.students), None, None),
+            'student.view_book_details': lambda: ('GET', f'/api/student/books/{self.book()}',
+                                                  rng.choice(self.students), None, None),
+            'student.borrow_book_request': lambda: ('POST', f'/api/student/loans/{self.book()}/borrow',
+                                                    rng.choice(self.students), None, None),
+            'student.view_loans_history': lambda: ('GET', '/api/student/loans_history',
+                                                   rng.choice(self.students), None, None),
+
+            # admin_bp
+            'admin.admin_login_required': lambda: ('POST', '/api/admin/login', {}, {
+                'email': dataset.ADMIN_EMAIL, 'password_hash': dataset.ADMIN_PASSWORD}, json_body),
+            'admin.admin_logout': lambda: ('POST', '/api/admin/logout', self._token_headers(self.admin_id, 'admin'),
+                                           None, None),
+            'admin.dashboard': lambda: ('GET', '/api/admin/dashboard', self.admin, None, None),
+            'admin.request_metrics': lambda: ('GET', '/api/admin/metrics', self.admin, None, None),
+            'admin.add_category': lambda: ('POST', '/api/admin/books/categories', self.admin,
+                                           {'name': self.name('cat')}, json_body),
+            'admin.edit_category': lambda: ('POST', f'/api/admin/books/categories/update/'
+                                            f'{rng.randint(1, self.counts["book_categories"])}', self.admin,
+                                            {'name': self.name('cat')}, json_body),
+            'admin.delete_category': lambda: ('DELETE', f'/api/admin/books/categories/delete/'
+                                              f'{self.deletable_categories.take()}', self.admin, None, None),
+            'admin.list_books': lambda: ('GET', f'/api/admin/books?after={self.book()}', self.admin, None, None),
+            'admin.admin_search_books': lambda: ('GET', f'/api/admin/books/search?q={rng.choice(dataset.WORDS)}', self.admin, None, None),
+            'admin.add_book': lambda: ('POST', '/api/admin/books', self.admin, {
+                'title': 'Bench', 'author': 'Bench', 'isbn': f'b{self.run_id[-6:]}-{next(self.unique)}', 'total_copies': 2}, json_body),
+            'admin.import_books_file': lambda: ('POST', '/api/admin/books/import', self.admin,
+                                                csv_books(), 'text/csv'),
+            'admin.update_book': lambda: ('PUT', f'/api/admin/books/update/{self.book()}', self.admin,
+                                          {'publisher': self.name('pub')}, json_body),
+            'admin.delete_book': lambda: ('DELETE', f'/api/admin/books/remove/{self.deletable_books.take()}',
+                                          self.admin, None, None),
+            'admin.register': lambda: ('POST', '/api/admin/register_student', self.admin, {
+                'firstname': 'Bench', 'lastname': 'Student', 'email': f'{self.name("adm")}@bench.example.com',
+                'password_hash': 'secret'}, json_body),
+            'admin.import_students_file': lambda: ('POST', '/api/admin/students/import', self.admin,
+                                                   csv_students(), 'text/csv'),
+            'admin.update_student': lambda: ('PUT', f'/api/admin/update_student/{self.student()}', self.admin,
+                                             {'middlename': 'B'}, json_body),
+            'admin.delete_student': lambda: ('DELETE', f'/api/admin/delete_student/{self.deletable_students.take()}',
+                                             self.admin, None, None),
+            'admin.student_history': lambda: ('GET', f'/api/admin/students/{self.student()}/history',
+                                              self.admin, None, None),
+            'admin.export_student_history': lambda: ('GET', f'/api/admin/students/{self.student()}/history/export'
+                                                     f'?format=csv', self.admin, None, None),
+            'admin.activate_membership': lambda: ('POST', f'/api/admin/library_membership/{self.student()}/activate',
+                                                  self.admin, None, None),
+            'admin.deactivate_membership': lambda: ('POST', f'/api/admin/library_membership/'
+                                                    f'{self.student()}/deactivate', self.admin, None, None),
+            'admin.view_loans': lambda: ('GET', f'/api/admin/loans?after={rng.randint(1, self.max_loan)}',
+                                         self.admin, None, None),
+            'admin.export_loans': lambda: ('GET', '/api/admin/loans/export?status=overdue', self.admin, None, None),
+            'admin.approve_loan': lambda: ('POST', f'/api/admin/loans/{self.pending.take()}/approve',
+                                           self.admin, None, None),
+            'admin.batch_loans': lambda: ('POST', '/api/admin/loans/batch', self.admin, {
+                'action': 'reject', 'loan_ids': [self.batch_pending.take() for _ in range(20)]}, json_body),
+            'admin.view_pending_loans': lambda: ('GET', '/api/admin/pending_loans', self.admin, None, None),
+            'admin.reject_loan': lambda: ('POST', f'/api/admin/loans/{self.rejectable.take()}/reject',
+                                          self.admin, None, None),
+            'admin.return_book': lambda: ('POST', f'/api/admin/loans/{self.on_loan.take()}/return',
+                                          self.admin, None, None),
+            'admin.view_overdue_loans': lambda: ('GET', '/api/admin/loans/overdue', self.admin, None, None),
+            'admin.view_loan_details': lambda: ('GET', f'/api/admin/loans/{rng.randint(1, self.max_loan)}',
+                                                self.admin, None, None),
+            'admin.add_class_level': lambda: ('POST', '/api/admin/class_levels/add', self.admin,
+                                              {'name': self.name('grade')[-50:]}, json_body),
+        }
+
+
+def _encode(body, content_type):
+    if body is None:
+        return None
+    return json.dumps(body).encode() if content_type == 'application/json' else body.encode()
+
+
+def run_test_client(app, scenarios, requests):
+    client = app.test_client()
+    results = {}
+    for endpoint, build in scenarios.items():
+        latencies, statuses = [], Counter()
+        started = time.perf_counter()
+        for _ in range(requests):
+            try:
+                method, path, headers, body, content_type = build()
+            except Exhausted:
+                break
+            begun = time.perf_counter()
+            response = client.open(path, method=method, headers=headers, data=_encode(body, content_type),
+                                   content_type=content_type)
+            response.get_data()
+            latencies.append(time.perf_counter() - begun)
+            statuses[response.status_code] += 1
+        results[endpoint] = summarize(latencies, statuses, time.perf_counter() - started)
+        print(f'  {endpoint:34} {results[endpoint]["p50_ms"]} ms p50', flush=True)
+    return results
+
+
+def run_http(app, scenarios, requests, threads):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    results = {}
+    try:
+        for endpoint, build in scenarios.items():
+            latencies, statuses = [], Counter()
+            lock = threading.Lock()
+            remaining = itertools.count()
+
+            def client():
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                while next(remaining) < requests:
+                    try:
+                        method, path, headers, body, content_type = build()
+                    except Exhausted:
+                        return
+                    headers = dict(headers)
+                    if content_type:
+                        headers['Content-Type'] = content_type
+                    begun = time.perf_counter()
+                    response = None
+                    try:
+                        connection.request(method, path, body=_encode(body, content_type), headers=headers)
+                        response = connection.getresponse()
+                        response.read()
+                        status = response.status
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                        status = 'connection error'
+                    elapsed = time.perf_counter() - begun
+                    with lock:
+                        latencies.append(elapsed)
+                        statuses[status] += 1
+                    if response is not None and response.will_close:
+                        connection.close()
+                        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                connection.close()
+
+            workers = [threading.Thread(target=client) for _ in range(threads)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            results[endpoint] = summarize(latencies, statuses, time.perf_counter() - started)
+            print(f'  {endpoint:34} {results[endpoint]["rps"]} req/s', flush=True)
+    finally:
+        server.shutdown()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f'\nchange vs {previous["meta"]["commit"]} (p95 latency, requests/s):')
+    for mode in ('test_client', 'http'):
+        for endpoint, now in current.get(mode, {}).items():
+            before = previous.get(mode, {}).get(endpoint)
+            if not before or not before.get('p95_ms') or not now.get('p95_ms'):
+                continue
+            p95 = (now['p95_ms'] / before['p95_ms'] - 1) * 100
+            rps = (now['rps'] / before['rps'] - 1) * 100 if before.get('rps') else 0
+            flag = '  <-- slower' if p95 > 20 else ''
+            print(f'  {mode:11} {endpoint:34} p95 {p95:+6.1f}%  rps {rps:+6.1f}%{flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-endpoint latency/throughput benchmark')
+    parser.add_argument('--database', help='SQLite file or database URL; seeded if it has no books yet')
+    parser.add_argument('--scale', type=float, default=1.0, help='dataset size as a fraction of full scale')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and mode')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent HTTP clients')
+    parser.add_argument('--mode', choices=('both', 'test_client', 'http'), default='both')
+    parser.add_argument('--only', help='comma separated endpoint names to run')
+    parser.add_argument('--output', help='results file (default benchmarks/results/endpoints-<commit>.json)')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='endpoints-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = database if '://' in database else f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = '0'
+    os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from sqlalchemy import func, select
+    from app import create_app, throttle
+    from app.bootstrap import create_schema
+    from app.models import Book, BookCategory, GradeLevel, InLibraryUse, Loan, Student, db
+
+    app = create_app('production')
+    # the benchmark logs in far more often than any real client
+    app.config['LOGIN_IP_BURST'] = app.config['LOGIN_ACCOUNT_BURST'] = 10 ** 9
+    throttle.init_app(app)
+
+    with app.app_context():
+        create_schema()
+        seeded = db.session.execute(select(func.count(Book.id))).scalar()
+    if not seeded:
+        print(f'seeding {database} at scale {args.scale:g}')
+        dataset.seed(app, args.scale, log=lambda line: print(f'  {line}', flush=True))
+    with app.app_context():
+        counts = {name: db.session.execute(select(func.count()).select_from(model)).scalar()
+                  for name, model in (('grade_levels', GradeLevel), ('book_categories', BookCategory),
+                                      ('books', Book), ('students', Student), ('loans', Loan),
+                                      ('in_library_uses', InLibraryUse))}
+
+    scenarios = Scenarios(app, counts, random.Random(7)).build()
+    blueprint_endpoints = {rule.endpoint for rule in app.url_map.iter_rules()
+                           if rule.endpoint.startswith(('admin.', 'student.'))}
+    missing = sorted(blueprint_endpoints - set(scenarios))
+    if args.only:
+        wanted = set(args.only.split(','))
+        scenarios = {name: build for name, build in scenarios.items() if name in wanted}
+
+    results = {'meta': {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'rows': counts,
+        'requests_per_endpoint': args.requests,
+        'http_threads': args.threads,
+        'not_covered': missing,
+    }}
+    if args.mode in ('both', 'test_client'):
+        print('test client:')
+        results['test_client'] = run_test_client(app, scenarios, args.requests)
+    if args.mode in ('both', 'http'):
+        print(f'http, {args.threads} clients:')
+        results['http'] = run_http(app, scenarios, args.requests, args.threads)
+
+    print(f'\n{"endpoint":34} {"mode":11} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9}  statuses')
+    for mode in ('test_client', 'http'):
+        for endpoint, row in results.get(mode, {}).items():
+            print(f'{endpoint:34} {mode:11} {row["p50_ms"]!s:>9} {row["p95_ms"]!s:>9} {row["p99_ms"]!s:>9} '
+                  f'{row["rps"]!s:>9}  {row["statuses"]}')
+    if missing:
+        print('not covered:', ', '.join(missing))
+
+    output = args.output or os.path.join(RESULTS_DIR, f'endpoints-{results["meta"]["commit"]}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nresults saved to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Concurrency stress test for the loan lifecycle's inventory updates.
+#
+# Many threads borrow, approve, reject and return loans (one at a time and
+# through /loans/batch) on a handful of scarce titles at the same time, through
+# the real endpoints, then the final state is checked: available_copies never
+# negative and always equal to total_copies minus the loans currently out, and
+# the dashboard counters match a full recount.
+#
+#   python benchmarks/inventory_stress.py --threads 16 --operations 200
+#
+# Exits non-zero if an invariant is violated.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=200, help='operations per thread')
+    parser.add_argument('--books', type=int, default=3)
+    parser.add_argument('--copies', type=int, default=2)
+    parser.add_argument('--students', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='inventory-stress-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "stress.db")}'
+    os.environ.setdefault('JWT_SECRET_KEY', 'inventory-stress-secret-key-0123456789')
+    os.environ['STATS_RECONCILE_INTERVAL'] = '0'
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func
+    from app import create_app, stats
+    from app.bootstrap import create_admin, create_schema
+    from app.models import Book, LibraryMember, Loan, Student, db
+
+    app = create_app()
+    app.config['LOGIN_IP_BURST'] = app.config['LOGIN_ACCOUNT_BURST'] = 10 ** 9
+
+    with app.app_context():
+        create_schema()
+        admin_user, _ = create_admin('admin@example.com', 'stress-admin', 'Stress', 'Admin')
+        books = [Book(title=f'Scarce {i}', author='Stress', isbn=f'stress-{i}',
+                      total_copies=args.copies, available_copies=args.copies) for i in range(args.books)]
+        students = [Student(firstname='S', lastname=str(i), email=f'stress{i}@example.com', password_hash='x')
+                    for i in range(args.students)]
+        db.session.add_all(books + students)
+        db.session.flush()
+        db.session.add_all(LibraryMember(student_id=student.id) for student in students)
+        db.session.commit()
+        stats.reconcile()
+        book_ids = [book.id for book in books]
+        admin_token = create_access_token(identity=str(admin_user.id), additional_claims={'role': 'admin'})
+        student_tokens = [create_access_token(identity=str(student.id), additional_claims={'role': 'student'})
+                          for student in students]
+
+    admin = {'Authorization': f'Bearer {admin_token}'}
+    errors = []
+    counts = {}
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        for _ in range(args.operations):
+            action = rng.choice(['borrow', 'borrow', 'approve', 'approve', 'reject', 'return', 'return', 'batch'])
+            if action == 'borrow':
+                headers = {'Authorization': f'Bearer {rng.choice(student_tokens)}'}
+                response = client.post(f'/api/student/loans/{rng.choice(book_ids)}/borrow', headers=headers)
+            elif action == 'batch':
+                with app.app_context():
+                    ids = [loan_id for (loan_id,) in db.session.query(Loan.id).order_by(func.random()).limit(5)]
+                body = {'action': rng.choice(['approve', 'reject', 'return']), 'loan_ids': ids}
+                response = client.post('/api/admin/loans/batch', headers=admin, json=body) if ids else None
+            else:
+                with app.app_context():
+                    status = ['pending'] if action != 'return' else list(stats.ON_LOAN_STATUSES)
+                    ids = [loan_id for (loan_id,) in db.session.query(Loan.id).filter(Loan.status.in_(status))
+                           .order_by(func.random()).limit(1)]
+                response = client.post(f'/api/admin/loans/{ids[0]}/{action}', headers=admin) if ids else None
+            if response is None:
+                continue
+            with lock:
+                key = (action, response.status_code)
+                counts[key] = counts.get(key, 0) + 1
+                if response.status_code >= 500:
+                    errors.append((action, response.status_code, response.get_data(as_text=True)[:200]))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for (action, status), count in sorted(counts.items()):
+        print(f'{action:8} {status}: {count}')
+
+    failures = [f'{action} -> {status}: {body}' for action, status, body in errors]
+    with app.app_context():
+        for book in Book.query.all():
+            out = Loan.query.filter(Loan.book_id == book.id, Loan.status.in_(stats.ON_LOAN_STATUSES)).count()
+            print(f'book {book.id}: total={book.total_copies} available={book.available_copies} on loan={out}')
+            if book.available_copies < 0:
+                failures.append(f'book {book.id} has negative inventory')
+            if book.available_copies != book.total_copies - out:
+                failures.append(f'book {book.id} drifted: available {book.available_copies}, expected {book.total_copies - out}')
+        drift = stats.reconcile()
+        if drift:
+            failures.append(f'dashboard counters drifted: {drift}')
+
+    for failure in failures:
+        print('FAIL', failure)
+    if failures:
+        sys.exit(1)
+    print('OK: inventory consistent')
+
+
+if __name__ == '__main__':
+    main()
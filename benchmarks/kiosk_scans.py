@@ -0,0 +1,140 @@
+# Reading room kiosk ingestion: throughput and consistency.
+#
+# Several kiosk threads post random check-in/check-out scans for a pool of
+# students and books through /in_library_uses/batch at the same time, each
+# batch resent now and then the way a kiosk retries after a timeout, and the
+# same number of scans is then sent one per request through the desk
+# endpoints for comparison. Afterwards every invariant is checked: at most one
+# open session per student and book, no session ending before it began, and
+# the occupancy counter equal to a recount of the open sessions.
+#
+#   python benchmarks/kiosk_scans.py --kiosks 4 --batches 50 --batch-size 200
+#
+# Exits non-zero if an invariant is violated.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reading room kiosk scan ingestion')
+    parser.add_argument('--kiosks', type=int, default=4)
+    parser.add_argument('--batches', type=int, default=50, help='batches per kiosk')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--books', type=int, default=100)
+    parser.add_argument('--resend', type=float, default=0.1, help='share of batches sent twice')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kiosk-scans-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "kiosk.db")}'
+    os.environ.setdefault('JWT_SECRET_KEY', 'kiosk-scans-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func, insert, select
+    from app import create_app, stats
+    from app.bootstrap import create_admin, create_schema
+    from app.models import Book, InLibraryUse, Student, db
+
+    app = create_app('production')
+    with app.app_context():
+        create_schema()
+        admin, _ = create_admin('kiosk@example.com', 'kiosk-admin', 'Kiosk', 'Admin')
+        db.session.execute(insert(Student), [
+            {'firstname': 'S', 'lastname': str(i), 'email': f's{i}@example.com', 'password_hash': 'x'}
+            for i in range(args.students)])
+        db.session.execute(insert(Book), [
+            {'title': f'Book {i}', 'author': 'A', 'isbn': f'kiosk-{i}', 'total_copies': 1, 'available_copies': 1}
+            for i in range(args.books)])
+        db.session.commit()
+        stats.reconcile()
+        student_ids = db.session.scalars(select(Student.id)).all()
+        book_ids = db.session.scalars(select(Book.id)).all()
+        headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=str(admin.id), additional_claims={'role': 'admin'})}
+
+    def random_scan(rng, when):
+        return {'action': rng.choice(('check_in', 'check_in', 'check_out')), 'student_id': rng.choice(student_ids),
+                'book_id': rng.choice(book_ids), 'scanned_at': when.isoformat()}
+
+    outcomes = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def kiosk(number):
+        rng = random.Random(number)
+        client = app.test_client()
+        when = datetime.now(timezone.utc) - timedelta(hours=1)
+        for _ in range(args.batches):
+            events = []
+            for _ in range(args.batch_size):
+                when += timedelta(milliseconds=rng.randint(1, 50))
+                events.append(random_scan(rng, when))
+            for _ in range(2 if rng.random() < args.resend else 1):
+                response = client.post('/api/admin/in_library_uses/batch', headers=headers, json={'events': events})
+                with lock:
+                    if response.status_code != 200:
+                        errors.append(response.get_json())
+                    else:
+                        outcomes.update(response.get_json()['outcomes'])
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=kiosk, args=(number,)) for number in range(args.kiosks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    scans = sum(outcomes.values())
+    print(f'batched: {scans} scans in {elapsed:.2f}s ({scans / elapsed:.0f} scans/s)')
+    print('outcomes: ' + ', '.join(f'{name} {count}' for name, count in sorted(outcomes.items())))
+
+    rng = random.Random(-1)
+    client = app.test_client()
+    singles = min(scans, 2000)
+    started = time.perf_counter()
+    for _ in range(singles):
+        event = random_scan(rng, datetime.now(timezone.utc))
+        client.post(f"/api/admin/in_library_uses/{event['action']}", headers=headers,
+                    json={'student_id': event['student_id'], 'book_id': event['book_id']})
+    elapsed = time.perf_counter() - started
+    print(f'one per request: {singles} scans in {elapsed:.2f}s ({singles / elapsed:.0f} scans/s)')
+
+    failures = [f'batch rejected: {error}' for error in errors[:3]]
+    with app.app_context():
+        open_sessions = db.session.execute(
+            select(func.count()).select_from(InLibraryUse).where(InLibraryUse.end_time.is_(None))).scalar()
+        doubled = db.session.execute(
+            select(func.count()).select_from(
+                select(InLibraryUse.student_id).where(InLibraryUse.end_time.is_(None))
+                .group_by(InLibraryUse.student_id, InLibraryUse.book_id).having(func.count() > 1).subquery())
+        ).scalar()
+        backwards = db.session.execute(
+            select(func.count()).select_from(InLibraryUse).where(InLibraryUse.end_time < InLibraryUse.use_date)
+        ).scalar()
+        counter = stats.snapshot()['reading_room_open']
+        occupancy = client.get('/api/admin/reading_room', headers=headers).get_json()
+    print(f'open sessions: {open_sessions}, counter {counter}, readers {occupancy["readers"]}')
+    if doubled:
+        failures.append(f'{doubled} student/book pairs with more than one open session')
+    if backwards:
+        failures.append(f'{backwards} sessions ending before they began')
+    if counter != open_sessions or occupancy['open_sessions'] != open_sessions:
+        failures.append(f'occupancy counter {counter} != {open_sessions} open sessions')
+    if failures:
+        raise SystemExit('; '.join(failures))
+    print('OK: reading room consistent')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Query-plan regression check on a throwaway seeded database, for CI.
+#
+# Creates a fresh database (a temporary SQLite file unless --database names an
+# empty one, e.g. a PostgreSQL URL) and seeds a small synthetic dataset
+# (benchmarks/dataset.py), so the planner has statistics and the endpoints
+# have rows to find. A few admins are added to the dataset's one: with a
+# single admin SQLite rightly scans that row in the loan listings' admin
+# join. Then the same check as `flask check-query-plans` (app/query_plans.py)
+# runs on it.
+#
+#   python benchmarks/query_plans.py
+#   python benchmarks/query_plans.py --database postgresql://localhost/plans_ci
+#
+# Exits non-zero if any endpoint query reads a whole table.
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset  # noqa: E402  (benchmarks/dataset.py)
+
+# admins besides the one dataset.seed() creates
+STAFF = 9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query-plan regression check on a seeded database')
+    parser.add_argument('--database', help='empty database URL to use instead of a temporary SQLite file')
+    parser.add_argument('--scale', type=float, default=0.01, help='fraction of the full-size dataset')
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    else:
+        workdir = tempfile.mkdtemp(prefix='query-plans-')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "plans.db")}'
+    os.environ.setdefault('JWT_SECRET_KEY', 'query-plans-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from sqlalchemy import insert, text
+    from app import create_app
+    from app.models import Admin, db
+    from app.query_plans import ENDPOINTS, check_query_plans
+
+    app = create_app('production')
+    dataset.seed(app, args.scale, log=lambda message: None)
+    with app.app_context():
+        db.session.execute(insert(Admin), [
+            {'firstname': 'Staff', 'lastname': str(i), 'email': f'staff{i}@plans.example.com', 'password_hash': 'x'}
+            for i in range(STAFF)])
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+        db.session.commit()
+    failures = check_query_plans(app)
+    for url, scans in failures.items():
+        for table, detail in scans:
+            print(f'{url}: full scan of {table} ({detail})')
+    if failures:
+        raise SystemExit(f'{len(failures)} of {len(ENDPOINTS)} endpoints read a whole table')
+    print(f'OK: all {len(ENDPOINTS)} endpoints use an index')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Read replica routing against two local SQLite files with simulated lag.
+#
+# The primary and one replica are separate SQLite files; a background thread
+# copies the primary over the replica every --lag seconds (the same thing
+# `flask sync-replicas --every N` does), so the replica is up to --lag seconds
+# behind. The script then checks that
+#
+#   - an admin who adds a book sees it on their next GET (read-your-writes),
+#     also when that GET is served by another worker (a second app instance
+#     that only has the client's read-your-writes cookie to go by),
+#   - another user's GET is served by the (stale) replica until it catches up,
+#   - and reports how GET statements split between primary and replica,
+#
+# exiting non-zero if the writer misses their own write or the replica never
+# catches up.
+#
+#   python benchmarks/replica_lag.py --lag 2 --reads 200
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read replica routing with simulated replication lag')
+    parser.add_argument('--lag', type=float, default=2.0, help='seconds between replica refreshes')
+    parser.add_argument('--reads', type=int, default=200, help='GET requests for the routing share')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='replica-lag-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "primary.db")}'
+    os.environ['DATABASE_REPLICA_URLS'] = f'sqlite:///{os.path.join(workdir, "replica.db")}'
+    os.environ['READ_YOUR_WRITES_SECONDS'] = str(args.lag * 2)
+    os.environ.setdefault('JWT_SECRET_KEY', 'replica-lag-secret-key-0123456789abcdef')
+    os.environ['STATS_RECONCILE_INTERVAL'] = os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from app import create_app
+    from app.bootstrap import create_admin, create_schema
+    from app.models import Book, LibraryMember, Student, db
+    from app.replicas import sync_sqlite_replicas
+
+    app = create_app('production')
+    other_worker = create_app('production')
+    statements = Counter()
+    with app.app_context():
+        create_schema()
+        admin, _ = create_admin('admin@example.com', 'replica-admin', 'Replica', 'Admin')
+        student = Student(firstname='Read', lastname='Only', email='reader@example.com', password_hash='x')
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(LibraryMember(student_id=student.id))
+        db.session.commit()
+        admin_headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=str(admin.id), additional_claims={'role': 'admin'})}
+        student_headers = {'Authorization': 'Bearer ' + create_access_token(
+            identity=str(student.id), additional_claims={'role': 'student'})}
+        sync_sqlite_replicas()
+        for key, engine in db.engines.items():
+            name = 'primary' if key is None else key
+
+            def count(conn, cursor, statement, parameters, context, executemany, name=name):
+                statements[name, statement.split(None, 1)[0].upper()] += 1
+            event.listen(engine, 'before_cursor_execute', count)
+
+    stop = threading.Event()
+
+    def replicate():
+        while not stop.wait(args.lag):
+            with app.app_context():
+                sync_sqlite_replicas()
+    threading.Thread(target=replicate, daemon=True).start()
+
+    client = app.test_client()
+    admin_client = app.test_client()
+    failures = []
+    try:
+        response = admin_client.post('/api/admin/books', headers=admin_headers, json={
+            'title': 'Replicated', 'author': 'Lag', 'isbn': 'replica-lag-1', 'total_copies': 1})
+        assert response.status_code == 201, response.get_json()
+        written = time.perf_counter()
+        with app.app_context():
+            book_id = db.session.execute(db.select(Book.id).filter_by(isbn='replica-lag-1')).scalar_one()
+
+        seen = admin_client.get(f'/api/admin/books?after={book_id - 1}', headers=admin_headers).get_json()['books']
+        if not any(book['id'] == book_id for book in seen):
+            failures.append('the writer did not read their own write')
+        print(f'writer reads own write:        {"yes" if not failures else "NO"}')
+
+        cookie_name = app.config['READ_YOUR_WRITES_COOKIE']
+        elsewhere = other_worker.test_client()
+        elsewhere.set_cookie(cookie_name, admin_client.get_cookie(cookie_name, path='/api').value, path='/api')
+        seen = elsewhere.get(f'/api/admin/books?after={book_id - 1}', headers=admin_headers).get_json()['books']
+        on_other_worker = any(book['id'] == book_id for book in seen)
+        if not on_other_worker:
+            failures.append('the writer did not read their own write on another worker')
+        print(f'... on another worker:         {"yes" if on_other_worker else "NO"}')
+
+        stale = client.get(f'/api/student/books/{book_id}', headers=student_headers).status_code == 404
+        print(f'other user served stale read:  {"yes" if stale else "no (replica already refreshed)"}')
+        while client.get(f'/api/student/books/{book_id}', headers=student_headers).status_code != 200:
+            if time.perf_counter() - written > args.lag * 3:
+                failures.append('the replica never caught up')
+                break
+            time.sleep(0.05)
+        else:
+            print(f'replica caught up after:       {time.perf_counter() - written:.2f}s (lag {args.lag:g}s)')
+
+        statements.clear()
+        for index in range(args.reads):
+            client.get(f'/api/student/books?after={index}', headers=student_headers)
+            client.get('/api/student/loans_history', headers=student_headers)
+        reads = {name: count for (name, verb), count in statements.items() if verb in ('SELECT', 'WITH')}
+        total = sum(reads.values()) or 1
+        print('GET statements by database:    ' +
+              ', '.join(f'{name} {count} ({count / total:.0%})' for name, count in sorted(reads.items())))
+    finally:
+        stop.set()
+
+    if failures:
+        raise SystemExit('; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Cold start time of a worker: importing the app package, building the app
+# with create_app(), and serving its first requests.
+#
+# Every sample runs in a fresh interpreter, as an autoscaled worker would. The
+# factory is pointed at a SQLite file in a directory that does not exist, so
+# any database access during import or create_app() fails the run: building
+# the app must not touch the database (the schema and first admin come from
+# `flask init-db` / `flask create-admin`). The first database-backed request is
+# then timed against a real, migrated-by-create_all database.
+#
+#   python benchmarks/startup.py --runs 10
+#   python benchmarks/startup.py --runs 10 --max-factory-ms 150 --output startup.json
+#
+# Exits non-zero if a run fails or the median factory time exceeds --max-factory-ms.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.environ['BENCH_ROOT'])
+import app as package
+imported = time.perf_counter()
+application = package.create_app('production')
+built = time.perf_counter()
+client = application.test_client()
+client.get('/')
+first = time.perf_counter()
+timings = {'import_ms': imported - started, 'factory_ms': built - imported, 'first_request_ms': first - built}
+if os.environ.get('BENCH_DB_READY'):
+    from flask_jwt_extended import create_access_token
+    with application.app_context():
+        token = create_access_token(identity='1', additional_claims={'role': 'student'})
+    begun = time.perf_counter()
+    status = client.get('/api/student/books', headers={'Authorization': f'Bearer {token}'}).status_code
+    timings['first_db_request_ms'] = time.perf_counter() - begun
+    assert status == 200, status
+print(json.dumps({name: round(value * 1000, 2) for name, value in timings.items()}))
+'''
+
+
+def sample(database_url, db_ready):
+    env = dict(os.environ, BENCH_ROOT=ROOT, DATABASE_URL=database_url,
+               JWT_SECRET_KEY=os.environ.get('JWT_SECRET_KEY', 'startup-benchmark-secret-key-0123456789'),
+               STATS_RECONCILE_INTERVAL='0', OVERDUE_SWEEP_INTERVAL='0')
+    if db_ready:
+        env['BENCH_DB_READY'] = '1'
+    result = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise SystemExit(f'startup run failed:\n{result.stderr[-2000:]}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker cold start benchmark')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-factory-ms', type=float, default=None,
+                        help='fail if the median create_app() time is above this')
+    parser.add_argument('--output', help='write the medians as JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    unreachable = f'sqlite:///{os.path.join(workdir, "missing", "library.db")}'
+    database = f'sqlite:///{os.path.join(workdir, "library.db")}'
+
+    sys.path.insert(0, ROOT)
+    os.environ['DATABASE_URL'] = database
+    os.environ.setdefault('JWT_SECRET_KEY', 'startup-benchmark-secret-key-0123456789')
+    os.environ['STATS_RECONCILE_INTERVAL'] = os.environ['OVERDUE_SWEEP_INTERVAL'] = '0'
+    from app import create_app
+    from app.bootstrap import create_schema
+    from app.models import Student, db
+    app = create_app('production')
+    with app.app_context():
+        create_schema()
+        db.session.add(Student(firstname='Cold', lastname='Start', email='cold@example.com', password_hash='x'))
+        db.session.commit()
+
+    # without a reachable database: proves import + factory do no database I/O
+    offline = [sample(unreachable, db_ready=False) for _ in range(args.runs)]
+    # with one: adds the first request that has to open a connection
+    online = [sample(database, db_ready=True) for _ in range(args.runs)]
+
+    results = {}
+    for name in ('import_ms', 'factory_ms', 'first_request_ms'):
+        values = [run[name] for run in offline]
+        results[name] = {'median': round(statistics.median(values), 2), 'max': max(values)}
+    values = [run['first_db_request_ms'] for run in online]
+    results['first_db_request_ms'] = {'median': round(statistics.median(values), 2), 'max': max(values)}
+
+    print(f'{args.runs} cold starts each (no database reachable during import/factory: ok)')
+    for name, row in results.items():
+        print(f'  {name:22} median {row["median"]:8.2f}   max {row["max"]:8.2f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_factory_ms is not None and results['factory_ms']['median'] > args.max_factory_ms:
+        raise SystemExit(f'create_app() took {results["factory_ms"]["median"]} ms, '
+                         f'budget is {args.max_factory_ms} ms')
+
+
+if __name__ == '__main__':
+    main()